@@ -0,0 +1,84 @@
+"""
+Many concurrent jobs on one event loop against a fake client with simulated rate limiting,
+then against a failing endpoint to show the circuit breaker. Before that, checks that the connection errors
+and timeouts raised by the real aio transports are retried.
+
+    python -m benchmarks.async_agents --jobs 200 --error-rate 0.2
+"""
+import argparse
+import asyncio
+import time
+from types import SimpleNamespace
+
+import httpx
+
+from src.async_agent import AsyncBaseAgent, CircuitBreaker, CircuitOpenError, RetryPolicy, aiohttp
+from src.fakes import FakeGenaiClient
+
+
+class PromptAgent(AsyncBaseAgent):
+    async def generate(self, prompt):
+        return await self._inference([prompt])
+
+
+class TransportErrorModels:
+    """`client.aio.models` raising each of the given errors once before it answers."""
+
+    def __init__(self, errors):
+        self.errors = list(errors)
+
+    async def generate_content(self, model, contents, config=None):
+        if self.errors:
+            raise self.errors.pop(0)
+        return SimpleNamespace(text="ok")
+
+
+def check_transport_errors():
+    request = httpx.Request("POST", "https://generativelanguage.googleapis.com")
+    errors = [httpx.ConnectError("Connection refused", request=request), httpx.ReadTimeout("Timed out", request=request)]
+    if aiohttp is not None:
+        errors += [aiohttp.ClientConnectionError("Connection reset"), aiohttp.ServerTimeoutError("Timed out")]
+
+    client = SimpleNamespace(aio=SimpleNamespace(models=TransportErrorModels(errors)))
+    agent = PromptAgent(client=client, retry_policy=RetryPolicy(attempts=len(errors) + 1, base_delay=0.01))
+    assert asyncio.run(agent.generate("prompt")) == "ok", "transport errors were not retried"
+    print(f"Transport errors retried: {', '.join(type(error).__name__ for error in errors)}")
+
+
+async def run_jobs(agent, num_jobs):
+    results = await asyncio.gather(*(agent.generate(f"prompt {i}") for i in range(num_jobs)), return_exceptions=True)
+    failed = [result for result in results if isinstance(result, Exception)]
+    rejected = [result for result in failed if isinstance(result, CircuitOpenError)]
+    return len(results) - len(failed), len(failed), len(rejected)
+
+
+def run(num_jobs, latency, error_rate, retry_delay):
+    policy = RetryPolicy(attempts=6, base_delay=0.05, max_delay=1.0)
+
+    client = FakeGenaiClient(latency=latency, error_rate=error_rate, retry_delay=retry_delay)
+    agent = PromptAgent(client=client, retry_policy=policy, circuit_breaker=CircuitBreaker(failure_threshold=10 ** 6))
+    start_time = time.perf_counter()
+    succeeded, failed, _ = asyncio.run(run_jobs(agent, num_jobs))
+    print(f"{num_jobs} jobs, {error_rate:.0%} rate limited: {time.perf_counter() - start_time:.2f}s, "
+          f"{succeeded} succeeded, {failed} failed")
+    print(f"  {agent.stats()}")
+
+    client = FakeGenaiClient(latency=latency, error_rate=1.0)
+    agent = PromptAgent(client=client, retry_policy=policy, circuit_breaker=CircuitBreaker(failure_threshold=20))
+    start_time = time.perf_counter()
+    succeeded, failed, rejected = asyncio.run(run_jobs(agent, num_jobs))
+    print(f"{num_jobs} jobs, endpoint down: {time.perf_counter() - start_time:.2f}s, "
+          f"{failed} failed ({rejected} rejected by the open circuit), {client.models.generate_calls} requests sent")
+    print(f"  {agent.stats()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--jobs", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--error-rate", type=float, default=0.2)
+    parser.add_argument("--retry-delay", type=float, help="Simulated Retry-After of the rate limit errors")
+    args = parser.parse_args()
+
+    check_transport_errors()
+    run(args.jobs, args.latency, args.error_rate, args.retry_delay)
@@ -0,0 +1,40 @@
+"""
+Cost of building API clients per agent vs sharing them through the client registry.
+Clients whose credentials are not configured on this machine are skipped.
+
+    python -m benchmarks.client_setup --agents 30
+"""
+import argparse
+import os
+import time
+
+from src.clients import DEFAULT_FACTORIES, ClientRegistry
+
+
+def run(num_agents):
+    os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+    for name, factory in DEFAULT_FACTORIES.items():
+        try:
+            start_time = time.perf_counter()
+            clients = [factory() for _ in range(num_agents)]
+            per_agent = time.perf_counter() - start_time
+        except Exception as e:
+            print(f"{name:13s} skipped: {type(e).__name__}")
+            continue
+
+        registry = ClientRegistry({name: factory})
+        start_time = time.perf_counter()
+        shared = [registry.get(name) for _ in range(num_agents)]
+        registry_time = time.perf_counter() - start_time
+        print(
+            f"{name:13s} per agent: {len(set(map(id, clients)))} clients in {per_agent:.3f}s, "
+            f"registry: {len(set(map(id, shared)))} client in {registry_time:.3f}s  {registry.stats()['created']}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--agents", type=int, default=30)
+    args = parser.parse_args()
+
+    run(args.agents)
@@ -0,0 +1,43 @@
+"""
+Sequential vs concurrent ImageDescriptionAgent.generate against a fake client with latency and 429 errors.
+
+    python -m benchmarks.image_description --images 40 --latency 0.2 --error-rate 0.05
+"""
+import argparse
+import time
+
+import pandas as pd
+
+from src.base_videos_store.image_description_agent import ImageDescriptionAgent
+from src.fakes import FakeGenaiClient
+from src.utils import RateLimiter
+
+
+def run(images, latency, error_rate, workers, requests_per_second):
+    for max_workers in workers:
+        images_df = pd.DataFrame({"image_path": [f"images/frame_{i}.png" for i in range(images)]})
+        agent = ImageDescriptionAgent(
+            client=FakeGenaiClient(latency=latency, error_rate=error_rate),
+            max_uploads=max_workers,
+            max_inferences=max_workers,
+            rate_limiter=RateLimiter(requests_per_second),
+        )
+
+        start_time = time.perf_counter()
+        result = agent.generate(images_df, max_workers=max_workers)
+        elapsed = time.perf_counter() - start_time
+
+        failed = result["description_error"].notna().sum()
+        print(f"workers={max_workers:>3}: {elapsed:6.2f}s, {images / elapsed:6.1f} images/sec, {failed} failed")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--images", type=int, default=40)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--error-rate", type=float, default=0.05)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests-per-second", type=float, default=50.0)
+    args = parser.parse_args()
+
+    run(args.images, args.latency, args.error_rate, args.workers, args.requests_per_second)
@@ -0,0 +1,58 @@
+"""
+Sequential vs pipelined batch with simulated stage latencies (seconds per video), shaped like generate_videos.
+
+    python -m benchmarks.pipeline --videos 12
+"""
+import argparse
+import time
+from functools import partial
+
+from src.pipeline import Pipeline, Stage
+
+
+STAGE_SECONDS = {"script": 1.2, "narration": 0.8, "clip_search": 0.6, "render": 2.0, "upload": 0.5}
+STAGE_WORKERS = {"script": 4, "narration": 4, "clip_search": 2, "render": 2, "upload": 1}
+
+
+def simulate(seconds, job):
+    time.sleep(seconds)
+    return job
+
+
+def run(num_videos, scale):
+    seconds = {name: value * scale for name, value in STAGE_SECONDS.items()}
+
+    start_time = time.perf_counter()
+    for video_num in range(num_videos):
+        for name in seconds:
+            simulate(seconds[name], video_num)
+    sequential = time.perf_counter() - start_time
+    print(f"sequential: {sequential:6.2f}s")
+
+    pipeline = Pipeline(
+        [
+            Stage(name, partial(simulate, seconds[name]), workers=STAGE_WORKERS[name], processes=name == "render")
+            for name in seconds
+        ],
+        sample_interval=0.05,
+    )
+    result = pipeline.run(range(num_videos))
+    report = result.report
+    print(f"pipelined:  {report['elapsed']:6.2f}s ({len(result.outputs)} videos)")
+
+    bottleneck = max(seconds[name] / STAGE_WORKERS[name] for name in seconds)
+    print(f"slowest stage bound: {bottleneck * num_videos:6.2f}s")
+    for name, stats in report["stages"].items():
+        print(
+            f"  {name:12s} workers={stats['workers']} utilization={100 * stats['utilization']:5.1f}% "
+            f"max queue={stats['max_queue_depth']} mean queue={stats['mean_queue_depth']:.2f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--videos", type=int, default=12)
+    parser.add_argument("--scale", type=float, default=0.5, help="Multiplier for the simulated stage latencies")
+    args = parser.parse_args()
+
+    run(args.videos, args.scale)
@@ -0,0 +1,73 @@
+"""
+Wall time and CPU time of the VideoBuilder render backends for a typical 60-second short, on synthetic inputs.
+
+    python -m benchmarks.render_backends --duration 60 --backends moviepy ffmpeg
+"""
+import argparse
+import os
+import resource
+import tempfile
+import time
+
+from benchmarks.synthetic import FONT_PATH, StaticTranscriber, make_clips, make_narration, make_word_timings
+from src.ffmpeg_utils import probe
+from src.video_generator.clip_cache import NormalizedClipCache
+from src.video_generator.video_builder import VideoBuilder
+
+
+def cpu_seconds():
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+def run(duration, time_per_base_video, backends, work_dir, **builder_kwargs):
+    num_clips = int(duration // time_per_base_video) + 2
+    video_paths = make_clips(os.path.join(work_dir, "clips"), num_clips, duration=time_per_base_video)
+    audio_path = make_narration(os.path.join(work_dir, f"narration_{duration}.wav"), duration=duration)
+    transcriber = StaticTranscriber(make_word_timings(duration))
+
+    for backend in backends:
+        workers = builder_kwargs.get("render_workers", 1)
+        output_path = os.path.join(work_dir, f"output_{backend}_{workers}.mp4")
+        builder = VideoBuilder(
+            audio_path,
+            video_paths,
+            font_path=FONT_PATH,
+            time_per_base_video=time_per_base_video,
+            output_path=output_path,
+            audio_transcriber=transcriber,
+            render_backend=backend,
+            **builder_kwargs,
+        )
+
+        start_time, start_cpu = time.perf_counter(), cpu_seconds()
+        builder.generate()
+        wall, cpu = time.perf_counter() - start_time, cpu_seconds() - start_cpu
+
+        info = probe(output_path)
+        print(
+            f"{backend:<8} x{workers:<3} wall {wall:6.1f}s  cpu {cpu:6.1f}s  "
+            f"-> {info['size'][0]}x{info['size'][1]}, {info['duration']:.2f}s"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--duration", type=float, default=60)
+    parser.add_argument("--time-per-base-video", type=int, default=7)
+    parser.add_argument("--backends", nargs="+", default=["moviepy", "ffmpeg"])
+    parser.add_argument("--work-dir", default=os.path.join(tempfile.gettempdir(), "render_benchmark"))
+    parser.add_argument("--clip-cache", action="store_true", help="Render from pre-normalized clips")
+    parser.add_argument("--render-workers", type=int, default=1, help="Processes for the moviepy backend")
+    args = parser.parse_args()
+
+    builder_kwargs = {"render_workers": args.render_workers}
+    if args.clip_cache:
+        clip_cache = NormalizedClipCache(os.path.join(args.work_dir, "normalized_clips"))
+        num_clips = int(args.duration // args.time_per_base_video) + 2
+        video_paths = make_clips(os.path.join(args.work_dir, "clips"), num_clips, duration=args.time_per_base_video)
+        clip_cache.warm_up(video_paths, (500, 800))
+        builder_kwargs["clip_cache"] = clip_cache
+
+    run(args.duration, args.time_per_base_video, args.backends, args.work_dir, **builder_kwargs)
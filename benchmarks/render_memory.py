@@ -0,0 +1,45 @@
+"""
+RSS and open file descriptors across a batch of moviepy renders, to check that readers don't leak.
+
+    python -m benchmarks.render_memory --videos 100 --duration 10
+"""
+import argparse
+import os
+import tempfile
+
+from benchmarks.synthetic import FONT_PATH, StaticTranscriber, make_clips, make_narration, make_word_timings
+from src.video_generator.clip_resources import current_rss_bytes, open_file_count
+from src.video_generator.video_builder import VideoBuilder
+
+
+def run(videos, duration, time_per_base_video, work_dir):
+    num_clips = int(duration // time_per_base_video) + 2
+    video_paths = make_clips(os.path.join(work_dir, "clips"), num_clips, duration=time_per_base_video)
+    audio_path = make_narration(os.path.join(work_dir, f"narration_{duration}.wav"), duration=duration)
+    transcriber = StaticTranscriber(make_word_timings(duration))
+
+    for video_num in range(videos):
+        builder = VideoBuilder(
+            audio_path,
+            video_paths,
+            font_path=FONT_PATH,
+            time_per_base_video=time_per_base_video,
+            output_path=os.path.join(work_dir, "output.mp4"),
+            audio_transcriber=transcriber,
+        )
+        builder.generate()
+        print(
+            f"video {video_num:>3}: rss {current_rss_bytes() / 1024 ** 2:7.1f} MB, "
+            f"open files {open_file_count():>4}, render {builder.resource_manager.report()}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--videos", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--time-per-base-video", type=int, default=3)
+    parser.add_argument("--work-dir", default=os.path.join(tempfile.gettempdir(), "render_memory_benchmark"))
+    args = parser.parse_args()
+
+    run(args.videos, args.duration, args.time_per_base_video, args.work_dir)
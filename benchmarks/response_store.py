@@ -0,0 +1,71 @@
+"""
+Record and replay of LLM responses with ScriptWriterAgent against a fake client: a replayed generation sends no
+requests, and a rejected script is not recorded, so retrying the job asks the model again.
+
+    python -m benchmarks.response_store
+"""
+import json
+import os
+import tempfile
+
+from src.fakes import FakeGenaiClient
+from src.response_store import ResponseStore
+from src.video_generator.script_writer_agent import ScriptWriterAgent
+
+
+def script_response(num_words):
+    return json.dumps({
+        "question": "Why do planes fly?",
+        "script": " ".join(["lift"] * num_words),
+        "title": "Why planes fly",
+        "tags": ["aviation", "planes", "physics"],
+    })
+
+
+class ScriptedResponder:
+    """Answers with too short scripts for the first `bad_responses` requests, then with valid ones."""
+
+    def __init__(self, bad_responses):
+        self.bad_responses = bad_responses
+
+    def __call__(self, contents):
+        if self.bad_responses:
+            self.bad_responses -= 1
+            return script_response(2)
+        return script_response(120)
+
+
+def generate(store, client, max_repairs=2):
+    agent = ScriptWriterAgent(client=client, response_store=store, mode="structured", max_repairs=max_repairs)
+    return agent.generate("Aviation")
+
+
+def run():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "responses.sqlite")
+        job_store = ResponseStore(path, mode="record").namespaced("run/Aviation/0")
+
+        # Every attempt of the first run is rejected: 1 request plus 2 repairs
+        client = FakeGenaiClient(responder=ScriptedResponder(bad_responses=3))
+        try:
+            generate(job_store, client)
+        except ValueError as e:
+            print(f"First attempt rejected after {client.models.generate_calls} requests: {e}")
+        first_attempt_calls = client.models.generate_calls
+
+        # The retried job must reach the model again instead of replaying the rejected responses
+        generate(job_store, client)
+        retry_calls = client.models.generate_calls - first_attempt_calls
+        assert retry_calls > 0, "the retried job was served the rejected responses"
+        print(f"Retried job: {retry_calls} requests, accepted")
+
+        # The accepted generation is recorded and replays without the model
+        replay_client = FakeGenaiClient(responder=ScriptedResponder(bad_responses=0))
+        replay_store = ResponseStore(path, mode="replay").namespaced("run/Aviation/0")
+        generate(replay_store, replay_client)
+        assert replay_client.models.generate_calls == 0
+        print(f"Replayed job: {replay_client.models.generate_calls} requests")
+
+
+if __name__ == "__main__":
+    run()
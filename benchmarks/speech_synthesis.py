@@ -0,0 +1,48 @@
+"""
+Whole-script vs sentence-parallel synthesis with a fake TTS client, cold and with a warm synthesis cache.
+
+    python -m benchmarks.speech_synthesis --sentences 12 --latency 0.5
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from src.cache import DiskCache
+from src.fakes import FakeTextToSpeechClient
+from src.video_generator.audio_generation_agent import AudioGenerationAgent
+
+
+def make_script(num_sentences):
+    return " ".join(f"Sentence number {i} is about a jet climbing over the clouds." for i in range(num_sentences))
+
+
+def run(num_sentences, latency, workers):
+    script = make_script(num_sentences)
+    with tempfile.TemporaryDirectory() as directory:
+        cache = DiskCache(os.path.join(directory, "synthesis.sqlite"))
+        for label, max_workers, agent_cache in [
+            ("sequential", 1, None),
+            (f"parallel x{workers}", workers, None),
+            (f"parallel x{workers}, cold cache", workers, cache),
+            (f"parallel x{workers}, warm cache", workers, cache),
+        ]:
+            client = FakeTextToSpeechClient(latency=latency)
+            agent = AudioGenerationAgent(client=client, max_workers=max_workers, cache=agent_cache, word_timings=True)
+            start_time = time.perf_counter()
+            narration = agent.generate_narration(script)
+            elapsed = time.perf_counter() - start_time
+            print(
+                f"{label:32s} {elapsed:6.2f}s  {client.synthesize_calls:3d} requests  "
+                f"{narration.duration:.1f}s of audio, {len(narration.word_timings)} words"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sentences", type=int, default=12)
+    parser.add_argument("--latency", type=float, default=0.5, help="Simulated seconds per synthesize request")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    run(args.sentences, args.latency, args.workers)
@@ -0,0 +1,87 @@
+"""
+Rendering all subtitles of a 90-second script: uncached rendering vs SubtitleRenderer.
+
+    python -m benchmarks.subtitle_rendering --renders 3
+"""
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+from src.video_generator.subtitle_renderer import SubtitleRenderer, SubtitleStyle
+
+FONT_PATH = str(Path(__file__).resolve().parents[1] / "assets/fonts/Roboto-VariableFont_wdth,wght.ttf")
+
+# ~2.5 words per second of narration, with a recurring hook and outro
+SCRIPT = " ".join(
+    ["Ever wondered why planes fly so high?"]
+    + [f"Reason number {i} is that thinner air at altitude means less drag and better fuel economy." for i in range(12)]
+    + ["Follow for more aviation facts!"]
+)
+
+
+def subtitle_texts(words_per_second=2.5, seconds=90, max_words=5):
+    words = (SCRIPT.split() * 3)[:int(words_per_second * seconds)]
+    return [" ".join(words[i:i + max_words]) for i in range(0, len(words), max_words)]
+
+
+def render_uncached(text, style):
+    """The original per-subtitle rendering: font loaded and every line measured again on each call."""
+    font = ImageFont.truetype(style.font_path, style.font_size)
+    max_width = style.max_width - 2 * style.padding
+    lines, current_line = [], []
+    for word in text.split():
+        line_width = font.getbbox(" ".join(current_line + [word]))[2] - font.getbbox(" ".join(current_line))[0]
+        if line_width <= max_width:
+            current_line.append(word)
+        else:
+            lines.append(" ".join(current_line))
+            current_line = [word]
+    if current_line:
+        lines.append(" ".join(current_line))
+
+    text_w = max([font.getbbox(line)[2] - font.getbbox(line)[0] for line in lines])
+    text_h = sum([font.getbbox(line)[3] - font.getbbox(line)[1] for line in lines])
+    img_w = text_w + 2 * style.padding
+    img_h = min(text_h + 2 * style.padding + 10, style.max_height)
+
+    img = Image.new("RGBA", (img_w, img_h), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(img)
+    draw.rounded_rectangle((0, 0, img_w, img_h), radius=style.radius, fill=style.bg_color)
+    y_offset = (img_h - text_h) / 2
+    for line in lines:
+        line_w = font.getbbox(line)[2] - font.getbbox(line)[0]
+        draw.text(((img_w - line_w) / 2, y_offset), line, font=font, fill=style.text_color)
+        y_offset += font.getbbox(line)[3] - font.getbbox(line)[1]
+    return np.array(img)
+
+
+def run(renders):
+    style = SubtitleStyle(FONT_PATH, 25, "white", "red", max_width=500, max_height=550)
+    texts = subtitle_texts()
+    renderer = SubtitleRenderer(style)
+
+    start_time = time.perf_counter()
+    for _ in range(renders):
+        expected = [render_uncached(text, style) for text in texts]
+    uncached = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    for _ in range(renders):
+        rendered = [renderer.render(text) for text in texts]
+    cached = time.perf_counter() - start_time
+
+    assert all(np.array_equal(a, b) for a, b in zip(expected, rendered))
+    print(f"{len(texts)} subtitles x {renders} renders")
+    print(f"uncached:          {uncached * 1000:8.1f} ms")
+    print(f"SubtitleRenderer:  {cached * 1000:8.1f} ms (hits={renderer.hits}, misses={renderer.misses})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--renders", type=int, default=3, help="How many times the script is rendered")
+    args = parser.parse_args()
+
+    run(args.renders)
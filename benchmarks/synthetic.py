@@ -0,0 +1,52 @@
+"""
+Synthetic inputs for the render benchmarks: base clips, narration audio and word timings, generated locally with ffmpeg.
+"""
+import os
+from pathlib import Path
+
+from src.ffmpeg_utils import run_ffmpeg
+
+FONT_PATH = str(Path(__file__).resolve().parents[1] / "assets/fonts/Roboto-VariableFont_wdth,wght.ttf")
+WORDS = "the wing pushes air down and the air pushes the wing up which is lift".split()
+
+
+def make_clips(directory, num_clips, duration=8, size=(720, 1280)):
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for i in range(num_clips):
+        path = os.path.join(directory, f"clip_{i}.mp4")
+        if not os.path.exists(path):
+            run_ffmpeg([
+                "-f", "lavfi", "-i", f"testsrc2=size={size[0]}x{size[1]}:rate=30:duration={duration}",
+                "-f", "lavfi", "-i", f"sine=frequency={220 + 20 * i}:duration={duration}",
+                "-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p", "-c:a", "aac", "-shortest", path,
+            ])
+        paths.append(path)
+    return paths
+
+
+def make_narration(path, duration=60, sample_rate=24000):
+    if not os.path.exists(path):
+        run_ffmpeg([
+            "-f", "lavfi", "-i", f"sine=frequency=440:sample_rate={sample_rate}:duration={duration}",
+            "-c:a", "pcm_s16le", "-ac", "1", path,
+        ])
+    return path
+
+
+def make_word_timings(duration=60, words_per_second=2.5):
+    timings = []
+    step = 1 / words_per_second
+    for i in range(int(duration * words_per_second)):
+        timings.append({"word": WORDS[i % len(WORDS)], "start": i * step, "end": i * step + step * 0.9})
+    return timings
+
+
+class StaticTranscriber:
+    """Stands in for AudioTranscriber, returning precomputed word timings."""
+
+    def __init__(self, word_timings):
+        self.word_timings = word_timings
+
+    def transcribe_audio_with_timestamps(self, audio):
+        return [dict(word) for word in self.word_timings]
@@ -0,0 +1,36 @@
+"""
+Sequential vs concurrent chunk transcription with a fake recognizer.
+
+    python -m benchmarks.transcription --duration 90 --latency 2
+"""
+import argparse
+import time
+
+import numpy as np
+
+from src.fakes import FakeSpeechClient
+from src.video_generator.audio_transcriber import AudioTranscriber
+from src.video_generator.narration_audio import NarrationAudio
+
+
+def run(duration, latency, workers):
+    narration = NarrationAudio(np.zeros(int(duration * 24000), dtype=np.int16), 24000)
+    for max_workers in workers:
+        transcriber = AudioTranscriber(client=FakeSpeechClient(latency=latency), max_workers=max_workers)
+        start_time = time.perf_counter()
+        subtitles = transcriber.transcribe_audio_with_timestamps(narration)
+        elapsed = time.perf_counter() - start_time
+        print(
+            f"workers={max_workers}: {elapsed:5.2f}s, {len(subtitles)} words, "
+            f"last word ends at {subtitles[-1]['end']:.2f}s"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--duration", type=float, default=90)
+    parser.add_argument("--latency", type=float, default=2.0, help="Simulated seconds per recognize request")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    args = parser.parse_args()
+
+    run(args.duration, args.latency, args.workers)
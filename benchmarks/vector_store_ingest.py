@@ -0,0 +1,40 @@
+"""
+Ingestion throughput of VectorStore.store against a local fake embedding client.
+
+    python -m benchmarks.vector_store_ingest --rows 2000 --latency 0.05
+"""
+import argparse
+import tempfile
+
+import pandas as pd
+
+from src.fakes import FakeGenaiClient
+from src.video_generator.vector_store import EmbeddingAgent, VectorStore
+
+
+def make_descriptions(rows):
+    return pd.DataFrame({
+        "video_path": [f"videos/clip_{i}.mp4" for i in range(rows)],
+        "description": [f"An aircraft number {i} taking off from a runway at dusk" for i in range(rows)],
+    })
+
+
+def run(rows, latency, batch_sizes, requests_per_second):
+    df = make_descriptions(rows)
+    for batch_size in batch_sizes:
+        with tempfile.TemporaryDirectory() as path:
+            embedding_agent = EmbeddingAgent(client=FakeGenaiClient(latency=latency))
+            vector_store = VectorStore(embedding_agent=embedding_agent, path=path)
+            throughput = vector_store.store(df, batch_size=batch_size, requests_per_second=requests_per_second)
+            print(f"batch_size={batch_size:>4}: {throughput:10.1f} rows/sec")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.05, help="Simulated seconds per embedding request")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--requests-per-second", type=float, default=50.0)
+    args = parser.parse_args()
+
+    run(args.rows, args.latency, args.batch_sizes, args.requests_per_second)
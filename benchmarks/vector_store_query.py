@@ -0,0 +1,55 @@
+"""
+Query latency of the chromadb and NumPy vector store backends, using a local fake embedding client.
+
+    python -m benchmarks.vector_store_query --clips 20000 --queries 60
+"""
+import argparse
+import tempfile
+import time
+
+from benchmarks.vector_store_ingest import make_descriptions
+from src.fakes import FakeGenaiClient
+from src.video_generator.vector_store import EmbeddingAgent, NumpyVectorStore, VectorStore
+
+
+def timed(func):
+    start_time = time.perf_counter()
+    func()
+    return time.perf_counter() - start_time
+
+
+def run(clips, queries, k):
+    df = make_descriptions(clips)
+    query_texts = [f"A plane number {i} landing in heavy rain" for i in range(queries)]
+
+    with tempfile.TemporaryDirectory() as path:
+        embedding_agent = EmbeddingAgent(client=FakeGenaiClient())
+        chroma_store = VectorStore(embedding_agent=embedding_agent, path=path)
+        numpy_store = NumpyVectorStore(embedding_agent=embedding_agent)
+        for vector_store in (chroma_store, numpy_store):
+            vector_store.store(df, requests_per_second=1000.0, write_batch_size=5000)
+
+        query_embeddings = embedding_agent.generate_batch(query_texts)
+        results = {
+            "chromadb, one query per call": timed(
+                lambda: [chroma_store.query_embeddings([embedding], k=k) for embedding in query_embeddings]
+            ),
+            "chromadb, batched": timed(lambda: chroma_store.query_embeddings(query_embeddings, k=k)),
+            "numpy, one query per call": timed(
+                lambda: [numpy_store.query_embeddings([embedding], k=k) for embedding in query_embeddings]
+            ),
+            "numpy, batched": timed(lambda: numpy_store.query_embeddings(query_embeddings, k=k)),
+        }
+
+    for name, elapsed in results.items():
+        print(f"{name:<30} {elapsed * 1000:9.2f} ms ({elapsed * 1000 / queries:.3f} ms/query)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clips", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=60)
+    parser.add_argument("-k", type=int, default=5)
+    args = parser.parse_args()
+
+    run(args.clips, args.queries, args.k)
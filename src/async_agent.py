@@ -0,0 +1,239 @@
+import asyncio
+import random
+import time
+from abc import ABC, abstractmethod
+from typing import NamedTuple
+
+import httpx
+
+from src.clients import get_client
+from src.utils import logger
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+# Request timeout, rate limited and transient server errors, anything else (bad request, auth, parse errors) is final
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+# Connection errors and timeouts of the genai aio transports (httpx, or aiohttp when it is installed) do not
+# subclass the built-in ConnectionError and TimeoutError
+RETRYABLE_EXCEPTIONS = (ConnectionError, TimeoutError, asyncio.TimeoutError, httpx.TransportError)
+if aiohttp is not None:
+    RETRYABLE_EXCEPTIONS += (aiohttp.ClientConnectionError, aiohttp.ServerTimeoutError)
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling an endpoint while its circuit breaker is open."""
+
+
+def _status_code(error):
+    code = getattr(error, "code", None)
+    if callable(code):
+        # grpc.RpcError exposes the status as a method
+        return None
+    try:
+        return int(code)
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(error):
+    """Whether a failed request may succeed if it's sent again."""
+    if isinstance(error, RETRYABLE_EXCEPTIONS):
+        return True
+    return _status_code(error) in RETRYABLE_STATUS_CODES
+
+
+def retry_after(error):
+    """
+    Seconds the server asked to wait before retrying: the Retry-After header of the response or the RetryInfo
+    detail of a Google API error. None if it gave no hint.
+    """
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if headers is not None:
+        try:
+            return float(headers.get("retry-after"))
+        except (TypeError, ValueError):
+            pass
+
+    details = getattr(error, "details", None)
+    if isinstance(details, dict):
+        for detail in details.get("error", {}).get("details", []):
+            if isinstance(detail, dict) and detail.get("@type", "").endswith("google.rpc.RetryInfo"):
+                try:
+                    return float(str(detail.get("retryDelay", "")).rstrip("s"))
+                except ValueError:
+                    return None
+    return None
+
+
+class RetryPolicy(NamedTuple):
+    """
+    Exponential backoff with full jitter: the n-th retry waits a random time up to
+    min(max_delay, base_delay * multiplier ** (n - 1)). A server hint (Retry-After) is honored instead,
+    up to max_retry_after.
+    """
+    attempts: int = 5
+    base_delay: float = 0.5
+    multiplier: float = 2.0
+    max_delay: float = 30.0
+    max_retry_after: float = 120.0
+
+    def delay(self, attempt, error):
+        hinted = retry_after(error)
+        if hinted is not None:
+            return min(hinted, self.max_retry_after)
+        return random.uniform(0, min(self.max_delay, self.base_delay * self.multiplier ** (attempt - 1)))
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive retryable failures and then rejects calls for `reset_timeout`
+    seconds. After that a single trial call is let through (half open): its success closes the circuit,
+    its failure opens it again. Meant to be used from one event loop.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.times_opened = 0
+        self._trial_in_flight = False
+
+    def before_call(self):
+        if self.state == "open":
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                raise CircuitOpenError(f"Circuit open after {self.consecutive_failures} consecutive failures")
+            self.state = "half_open"
+        if self.state == "half_open":
+            if self._trial_in_flight:
+                raise CircuitOpenError("Circuit half open, waiting for the trial call")
+            self._trial_in_flight = True
+
+    def record_success(self):
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+            if self.state != "open":
+                self.times_opened += 1
+                logger.warning(f"Circuit opened after {self.consecutive_failures} consecutive failures")
+            self.state = "open"
+            self.opened_at = time.monotonic()
+        self._trial_in_flight = False
+
+    def cancel_trial(self):
+        self._trial_in_flight = False
+
+    def record_final(self):
+        """A non-retryable error: the endpoint answered, so it does not count against the circuit."""
+        self._trial_in_flight = False
+        if self.state == "half_open":
+            self.state = "closed"
+
+
+class AgentMetrics:
+    def __init__(self):
+        self.requests = 0
+        self.successes = 0
+        self.failures = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.backoff_seconds = 0.0
+        self.circuit_rejections = 0
+
+    def as_dict(self):
+        return dict(vars(self))
+
+
+class AsyncBaseAgent(ABC):
+    """
+    asyncio counterpart of BaseAgent, so that many jobs can share one event loop. Requests are retried only
+    for retryable errors, with jittered exponential backoff or the delay the server asked for, and stop
+    while the agent's circuit breaker is open. Retry counts and time spent backing off are in `stats()`.
+    Several agents calling the same endpoint can share one CircuitBreaker.
+    """
+
+    def __init__(self, client=None, response_store=None, retry_policy=None, circuit_breaker=None):
+        # Shared process-wide client unless one is injected
+        self.client = client or get_client("genai")
+        self.model = 'gemini-2.0-flash-001'
+        self.response_store = response_store
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+        self.metrics = AgentMetrics()
+
+    @abstractmethod
+    async def generate(self, **kwargs):
+        pass
+
+    async def _inference(self, contents, config=None, key_contents=None):
+        """Same as BaseAgent._inference, including the response store, without blocking the event loop."""
+        if self.response_store is None:
+            return await self._with_retries(self._generate_content, contents, config)
+
+        key = self.response_store.make_key(self.model, key_contents if key_contents is not None else contents, config)
+        response = self.response_store.lookup(key)
+        if response is None:
+            response = await self._with_retries(self._generate_content, contents, config)
+            self.response_store.record(key, response)
+        return response
+
+    async def _generate_content(self, contents, config=None):
+        response = await self.client.aio.models.generate_content(
+            model=self.model,
+            contents=contents,
+            config=config
+        )
+        return response.text
+
+    async def _with_retries(self, request, *args):
+        for attempt in range(1, self.retry_policy.attempts + 1):
+            try:
+                self.circuit_breaker.before_call()
+            except CircuitOpenError:
+                self.metrics.circuit_rejections += 1
+                self.metrics.failures += 1
+                raise
+
+            self.metrics.requests += 1
+            try:
+                result = await request(*args)
+            except asyncio.CancelledError:
+                self.circuit_breaker.cancel_trial()
+                raise
+            except Exception as e:
+                if not is_retryable(e):
+                    self.circuit_breaker.record_final()
+                    self.metrics.failures += 1
+                    raise
+                self.circuit_breaker.record_failure()
+                if attempt == self.retry_policy.attempts:
+                    self.metrics.failures += 1
+                    raise
+
+                delay = self.retry_policy.delay(attempt, e)
+                if _status_code(e) == 429:
+                    self.metrics.rate_limited += 1
+                self.metrics.retries += 1
+                self.metrics.backoff_seconds += delay
+                logger.warning(f"{type(self).__name__} attempt {attempt} failed: {e}. Retrying in {delay:.2f} seconds")
+                await asyncio.sleep(delay)
+            else:
+                self.circuit_breaker.record_success()
+                self.metrics.successes += 1
+                return result
+
+    def stats(self):
+        return {
+            **self.metrics.as_dict(),
+            "circuit_state": self.circuit_breaker.state,
+            "circuit_opened": self.circuit_breaker.times_opened,
+        }
@@ -1,9 +1,15 @@
+import os
 from pathlib import Path
 
+import pandas as pd
 from dotenv import load_dotenv
 
 from src.base_videos_store.image_description_agent import ImageDescriptionAgent
+from src.base_videos_store.manifest import Manifest
 from src.base_videos_store.utils import extract_first_frame, process_raw_videos
+from src.response_store import RESPONSE_STORE_PATH, ResponseStore
+from src.utils import RateLimiter, logger
+from src.video_generator.vector_store import VectorStore
 
 # RAW_VIDEOS_PATH = "/Users/wnowogorski/PycharmProjects/TikTokGenerator/data/videos_raw"
 # PROCESSED_VIDEOS_PATH = "/Users/wnowogorski/PycharmProjects/TikTokGenerator/data/videos_processed"
@@ -13,6 +19,109 @@ from src.base_videos_store.utils import extract_first_frame, process_raw_videos
 # FIRST_FRAME_IMAGES_PATH = "/Users/wnowogorski/PycharmProjects/TikTokGenerator/data/images_temp"
 
 DATA_PATH = Path("//data")
+DESCRIPTION_REQUESTS_PER_SECOND = 5
+
+
+def rebuild(data_path, csv_path, vector_store=None, workers=1, use_ffmpeg=False, response_store=None):
+    """
+    Incrementally rebuild the base videos store. Only raw videos which are new or changed since the last
+    run (according to the manifest) are processed, described and indexed, outputs of deleted videos are
+    dropped, and only the changed rows are written to the CSV and the vector store.
+    """
+    raw_dir = data_path / "videos_raw"
+    processed_dir = data_path / "videos_processed"
+    images_dir = data_path / "images"
+    manifest = Manifest(str(data_path / "manifest.json"))
+
+    changed, deleted = manifest.diff(raw_dir)
+    logger.info(f"Rebuilding base videos store: {len(changed)} new or changed, {len(deleted)} deleted")
+
+    for filename in changed + deleted:
+        if filename not in manifest.files:
+            continue
+        # Their CSV rows and vectors are deleted below, the manifest keeps them pending until then
+        stages = manifest.remove(filename)
+        stale_files = stages.get("processed", []) + [image_path for _, image_path in stages.get("frames", [])]
+        for path in stale_files:
+            if os.path.exists(path):
+                os.remove(path)
+    for filename in changed:
+        manifest.add(raw_dir, filename)
+    manifest.save()
+
+    # CROP AND SPLIT RAW VIDEOS
+    segments = process_raw_videos(
+        raw_dir, processed_dir, filenames=manifest.pending("processed"), workers=workers, use_ffmpeg=use_ffmpeg
+    )
+    for filename, paths in segments.items():
+        manifest.complete_stage(filename, "processed", paths)
+    manifest.save()
+
+    # EXTRACT FIRST FRAMES
+    pending = [filename for filename in manifest.pending("frames") if manifest.outputs(filename, "processed") is not None]
+    video_to_file = {
+        video_path: filename for filename in pending for video_path in manifest.outputs(filename, "processed")
+    }
+    frames_df = extract_first_frame(processed_dir, images_dir, video_paths=list(video_to_file), workers=workers)
+    frames = {filename: [] for filename in pending}
+    for video_path, image_path in zip(frames_df.get("video_path", []), frames_df.get("image_path", [])):
+        frames[video_to_file[video_path]].append([video_path, image_path])
+    # Files with a failed frame extraction stay pending and are retried on the next rebuild
+    for filename, file_frames in frames.items():
+        if len(file_frames) == len(manifest.outputs(filename, "processed")):
+            manifest.complete_stage(filename, "frames", file_frames)
+        else:
+            logger.warning(
+                f"Frames of {filename}: {len(file_frames)} of {len(manifest.outputs(filename, 'processed'))} extracted"
+            )
+    manifest.save()
+
+    # DESCRIBE NEW FRAMES, UPSERT INTO THE CSV
+    if os.path.exists(csv_path):
+        existing_df = pd.read_csv(csv_path)
+    else:
+        existing_df = pd.DataFrame(columns=["video_path", "image_path", "description"])
+    pending = [filename for filename in manifest.pending("described") if manifest.outputs(filename, "frames") is not None]
+    images_df = pd.DataFrame(
+        [frame for filename in pending for frame in manifest.outputs(filename, "frames")],
+        columns=["video_path", "image_path"]
+    )
+    if len(images_df):
+        description_agent = ImageDescriptionAgent(
+            rate_limiter=RateLimiter(DESCRIPTION_REQUESTS_PER_SECOND), response_store=response_store
+        )
+        described_df = description_agent.generate(images_df, max_workers=workers)
+    else:
+        described_df = images_df.assign(description=[], description_error=[])
+
+    # Files with a failed description stay pending and are retried on the next rebuild
+    failed_videos = set(described_df.loc[described_df["description_error"].notna(), "video_path"])
+    described_df = described_df[~described_df["video_path"].isin(failed_videos)].drop(columns=["description_error"])
+
+    stale_videos = manifest.pending_deletions["csv"]
+    existing_df = existing_df[~existing_df["video_path"].isin(stale_videos + described_df["video_path"].tolist())]
+    pd.concat([existing_df, described_df], ignore_index=True).to_csv(csv_path, index=False)
+    manifest.deletions_done("csv")
+    for filename in pending:
+        if not any(video_path in failed_videos for video_path, _ in manifest.outputs(filename, "frames")):
+            manifest.complete_stage(filename, "described")
+    manifest.save()
+
+    # UPSERT INTO THE VECTOR STORE
+    if vector_store is not None:
+        vector_store.delete(manifest.pending_deletions["vector_store"])
+        manifest.deletions_done("vector_store")
+        pending = [filename for filename in manifest.pending("indexed") if filename not in manifest.pending("described")]
+        pending_videos = {video_path for filename in pending for video_path in manifest.outputs(filename, "processed")}
+        all_df = pd.read_csv(csv_path)
+        delta_df = all_df[all_df["video_path"].isin(pending_videos)].set_index("video_path", drop=False)
+        if len(delta_df):
+            vector_store.store(delta_df)
+        for filename in pending:
+            manifest.complete_stage(filename, "indexed")
+        manifest.save()
+
+    logger.info(f"Base videos store rebuilt: {len(manifest.files)} raw videos")
 
 
 if __name__ == "__main__":
@@ -21,13 +130,11 @@ if __name__ == "__main__":
     env_path = Path(ENV_PATH)
     load_dotenv(dotenv_path=env_path)
 
-    # LOAD RAW VIDEOS
-
-    process_raw_videos(DATA_PATH / "videos_raw", DATA_PATH / "videos_processed")
-
-    # EXTRACT FIRST FRAME, RETURN DF
-    df = extract_first_frame(DATA_PATH / "videos_processed", DATA_PATH / "images")
-
-    image_description_agent = ImageDescriptionAgent()
-    df = image_description_agent.generate(df)
-    df.to_csv(DATA_PATH / "aviation.csv", index=False)
+    rebuild(
+        DATA_PATH,
+        DATA_PATH / "aviation.csv",
+        vector_store=VectorStore(),
+        workers=os.cpu_count(),
+        use_ffmpeg=True,
+        response_store=ResponseStore(RESPONSE_STORE_PATH, mode=os.environ.get("RESPONSE_STORE_MODE", "record")),
+    )
@@ -1,28 +1,91 @@
-from src.utils import BaseAgent, retry_on_exception
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from src.utils import BaseAgent, file_hash, logger
 
 
 IMAGE_DESCRIPTION_PROMPT = """
 Could you describe this image? Format your output as a python list with one string
 """
+REQUEST_ATTEMPTS = 3
+RETRY_DELAY = 1
+RETRY_BACKOFF = 5
 
 
 class ImageDescriptionAgent(BaseAgent):
-    def generate(self, images_df):
-        descriptions = []
-        for i, image_path in enumerate(images_df['image_path']):
-            print("Describing images: {}/{}".format(i, len(images_df)))
-            des = self.get_description_text(image_path)
-            image_description = des[des.find('[') + 1:des.find(']')]
-            descriptions.append(image_description)
+    def __init__(self, client=None, max_uploads=4, max_inferences=4, rate_limiter=None, response_store=None):
+        super().__init__(client, response_store)
+        self._upload_slots = threading.Semaphore(max_uploads)
+        self._inference_slots = threading.Semaphore(max_inferences)
+        self.rate_limiter = rate_limiter
+
+    def generate(self, images_df, max_workers=1):
+        """
+        Describe every image in images_df using `max_workers` threads. Descriptions are returned in
+        DataFrame order, a row which failed gets no description and its error in "description_error".
+        """
+        descriptions = [None] * len(images_df)
+        errors = [None] * len(images_df)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(self.get_description_text, image_path): i
+                for i, image_path in enumerate(images_df['image_path'])
+            }
+            for done, future in enumerate(as_completed(futures)):
+                print("Describing images: {}/{}".format(done, len(images_df)))
+                i = futures[future]
+                try:
+                    des = future.result()
+                    descriptions[i] = des[des.find('[') + 1:des.find(']')]
+                except Exception as e:
+                    logger.error(f"Describing {images_df['image_path'].iloc[i]} failed: {e}")
+                    errors[i] = str(e)
 
         images_df['description'] = descriptions
+        images_df['description_error'] = errors
 
         return images_df
 
-    @retry_on_exception(attempts=2)
     def get_description_text(self, image_path):
-        file = self.client.files.upload(file=image_path)
+        # Recorded responses are keyed by the image content, so a hit skips the upload too
+        key = None
+        if self.response_store is not None:
+            key = self.response_store.make_key(
+                self.model, [IMAGE_DESCRIPTION_PROMPT, {"image_sha256": file_hash(image_path)}]
+            )
+            recorded = self.response_store.lookup(key)
+            if recorded is not None:
+                return recorded
+
+        file = self._request(self._upload_slots, self.client.files.upload, file=image_path)
         prompt_contents = [IMAGE_DESCRIPTION_PROMPT, file]
-        response = self._inference(prompt_contents)
+        response = self._request(self._inference_slots, self._request_content, prompt_contents)
 
+        if key is not None:
+            self.response_store.record(key, response)
         return response
+
+    def _request(self, slots, request, *args, **kwargs):
+        """
+        Send the request holding one of `slots` and a rate limiter token, both taken again for every attempt.
+        Failed attempts back off without holding the slot, so other images can use it meanwhile.
+        """
+        delay = RETRY_DELAY
+        for attempt in range(1, REQUEST_ATTEMPTS + 1):
+            with slots:
+                self._wait_for_rate_limit()
+                try:
+                    return request(*args, **kwargs)
+                except Exception as e:
+                    if attempt == REQUEST_ATTEMPTS:
+                        raise
+                    error = e
+            logger.warning(f"Attempt {attempt} failed: {error}. Retrying in {delay} seconds")
+            time.sleep(delay)
+            delay *= RETRY_BACKOFF
+
+    def _wait_for_rate_limit(self):
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
@@ -0,0 +1,92 @@
+import json
+import os
+
+from src.utils import file_hash
+
+
+STAGES = ("processed", "frames", "described", "indexed")
+# Where the outputs of removed files still have to be deleted from
+DELETION_TARGETS = ("csv", "vector_store")
+
+
+class Manifest:
+    """
+    Records every raw video of the base videos store together with its fingerprint and the outputs
+    of each ingest stage it has completed, so a rebuild only has to process new or changed files.
+    Processed videos of removed files are kept as pending deletions until their CSV rows and vectors are gone,
+    so a rebuild which crashed in between still deletes them.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.files = {}
+        self.pending_deletions = {target: [] for target in DELETION_TARGETS}
+        if os.path.exists(path):
+            with open(path) as f:
+                data = json.load(f)
+            self.files = data["files"]
+            self.pending_deletions.update(data.get("pending_deletions", {}))
+
+    def save(self):
+        out_directory = os.path.dirname(self.path)
+        if out_directory and not os.path.exists(out_directory):
+            os.makedirs(out_directory)
+
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump({"files": self.files, "pending_deletions": self.pending_deletions}, f, indent=2)
+        os.replace(temp_path, self.path)
+
+    def diff(self, raw_dir):
+        """
+        Compare the manifest with the mp4 files in `raw_dir`. Returns (new_or_changed, deleted) filenames.
+        Size and mtime are checked first, the content hash only when they differ.
+        """
+        current = sorted(filename for filename in os.listdir(raw_dir) if filename.lower().endswith(".mp4"))
+        changed = []
+        for filename in current:
+            path = os.path.join(raw_dir, filename)
+            stat = os.stat(path)
+            entry = self.files.get(filename)
+            if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+                continue
+
+            content_hash = file_hash(path)
+            if entry and entry["hash"] == content_hash:
+                entry["mtime_ns"] = stat.st_mtime_ns
+                continue
+
+            changed.append(filename)
+
+        deleted = [filename for filename in self.files if filename not in current]
+        return changed, deleted
+
+    def add(self, raw_dir, filename):
+        path = os.path.join(raw_dir, filename)
+        stat = os.stat(path)
+        self.files[filename] = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "hash": file_hash(path),
+            "stages": {},
+        }
+
+    def remove(self, filename):
+        """Drop the file from the manifest and return the outputs recorded for it."""
+        stages = self.files.pop(filename)["stages"]
+        for target in DELETION_TARGETS:
+            self.pending_deletions[target].extend(stages.get("processed", []))
+        return stages
+
+    def deletions_done(self, target):
+        """Forget the pending deletions from `target` once they were carried out."""
+        self.pending_deletions[target] = []
+
+    def complete_stage(self, filename, stage, outputs=True):
+        self.files[filename]["stages"][stage] = outputs
+
+    def pending(self, stage):
+        return [filename for filename, entry in self.files.items() if stage not in entry["stages"]]
+
+    def outputs(self, filename, stage):
+        return self.files[filename]["stages"].get(stage)
@@ -1,30 +1,71 @@
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
 import pandas as pd
 from moviepy.editor import VideoFileClip
 
-def extract_first_frame(video_dir, image_dir):
-    if not os.path.exists(image_dir):
-        os.makedirs(image_dir)
+from src.ffmpeg_utils import probe, run_ffmpeg
+from src.utils import logger
 
-    records = []
 
-    for filename in os.listdir(video_dir):
-        if filename.lower().endswith(".mp4"):
-            video_path = os.path.join(video_dir, filename)
+def _extract_frames(video_path, image_dir, timestamps, thumbnail_width):
+    base_filename = os.path.splitext(os.path.basename(video_path))[0]
+    scale = f"scale='min({thumbnail_width},iw)':-2" if thumbnail_width else "null"
 
-            clip = VideoFileClip(video_path)
+    records = []
+    for i, t in enumerate(timestamps):
+        image_filename = base_filename + (".png" if len(timestamps) == 1 else f"_{i}.png")
+        image_path = os.path.join(image_dir, image_filename)
+        if os.path.exists(image_path):
+            os.remove(image_path)
+        # Seeking before the input only decodes from the preceding keyframe
+        run_ffmpeg(["-ss", t, "-i", video_path, "-an", "-frames:v", 1, "-vf", scale, image_path])
+        if not os.path.exists(image_path):
+            logger.warning(f"No frame at {t}s in {video_path}")
+            continue
+        records.append({
+            "video_path": video_path,
+            "image_path": image_path
+        })
+
+    if not records:
+        raise RuntimeError("No frames extracted")
+    return records
+
+
+def extract_first_frame(video_dir, image_dir, video_paths=None, timestamps=(0,), thumbnail_width=512, workers=8):
+    """
+    Save the first frame (or the frames at `timestamps`) of every mp4 file in video_dir, or of `video_paths`
+    only when given, scaled down to `thumbnail_width`. Only the requested frames are decoded, by ffmpeg
+    calls running in a pool of `workers` threads.
+    Returns a DataFrame with video_path and image_path columns, one row per extracted frame.
+    """
+    if not os.path.exists(image_dir):
+        os.makedirs(image_dir)
 
-            image_filename = os.path.splitext(filename)[0] + ".png"
-            image_path = os.path.join(image_dir, image_filename)
+    if video_paths is None:
+        video_paths = [
+            os.path.join(video_dir, filename)
+            for filename in os.listdir(video_dir) if filename.lower().endswith(".mp4")
+        ]
 
-            clip.save_frame(image_path, t=0)
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(_extract_frames, video_path, image_dir, timestamps, thumbnail_width)
+            for video_path in video_paths
+        ]
 
-            records.append({
-                "video_path": video_path,
-                "image_path": image_path
-            })
+    records = []
+    for video_path, future in zip(video_paths, futures):
+        try:
+            records.extend(future.result())
+        except Exception as e:
+            logger.error(f"Extracting frames from {video_path} failed: {e}")
 
-            clip.close()
+    elapsed = time.perf_counter() - start_time
+    logger.info(f"Extracted {len(records)} frames from {len(video_paths)} videos in {elapsed:.1f}s")
 
     df = pd.DataFrame(records)
     return df
@@ -53,36 +94,141 @@ def crop_to_phone(clip, target_ratio=9/16):
     return cropped
 
 
-def process_raw_videos(input_dir, output_dir, segment_duration=10, num_segments=1):
+def phone_crop_filter(width, height, target_ratio=9/16):
+    """
+    ffmpeg crop filter cutting the center of a width x height frame to the target aspect ratio,
+    or None if the frame already has it.
+    """
+    if abs(width / height - target_ratio) < 0.01:
+        return None
+
+    if width / height > target_ratio:
+        new_w, new_h = int(height * target_ratio) // 2 * 2, height // 2 * 2
+    else:
+        new_w, new_h = width // 2 * 2, int(width / target_ratio) // 2 * 2
+    return f"crop={new_w}:{new_h}:{(width - new_w) // 2}:{(height - new_h) // 2}"
+
+
+def _process_raw_video_moviepy(input_path, output_dir, base_filename, segment_duration, num_segments):
+    clip = VideoFileClip(input_path)
+
+    # Crop the clip to phone aspect ratio
+    cropped_clip = crop_to_phone(clip)
+
+    output_paths = []
+    for i in range(num_segments):
+        start = i * segment_duration
+        end = start + segment_duration
+        if end > cropped_clip.duration:
+            end = cropped_clip.duration
+        segment = cropped_clip.subclip(start, end)
+        output_filename = f"{base_filename}_part{i+1}.mp4"
+        output_path = os.path.join(output_dir, output_filename)
+        print(f"  Writing segment {i+1} to {output_path}...")
+        segment.write_videofile(output_path, codec="libx264", audio_codec="aac", logger=None)
+        output_paths.append(output_path)
+
+    # Clean up
+    clip.close()
+    cropped_clip.close()
+    return output_paths
+
+
+def _process_raw_video_ffmpeg(input_path, output_dir, base_filename, segment_duration, num_segments):
     """
-    Processes each mp4 file in input_dir: crops to 9:16, splits into segments,
-    and writes segments to output_dir.
+    Crop and trim with a single ffmpeg call per segment. Sources which already are 9:16 are only trimmed,
+    with stream copy (segment starts snap to the nearest preceding keyframe).
+    """
+    info = probe(input_path)
+    crop = phone_crop_filter(*info["size"])
+
+    output_paths = []
+    for i in range(num_segments):
+        start = i * segment_duration
+        if start >= info["duration"]:
+            break
+        end = min(start + segment_duration, info["duration"])
+        output_path = os.path.join(output_dir, f"{base_filename}_part{i+1}.mp4")
+
+        args = ["-ss", start, "-i", input_path, "-t", end - start]
+        if crop is None:
+            args += ["-c", "copy", "-avoid_negative_ts", "make_zero"]
+        else:
+            args += ["-vf", crop, "-c:v", "libx264", "-pix_fmt", "yuv420p", "-c:a", "aac"]
+        print(f"  Writing segment {i+1} to {output_path}...")
+        run_ffmpeg(args + [output_path])
+        output_paths.append(output_path)
+
+    return output_paths
+
+
+def _process_raw_video(input_dir, output_dir, filename, segment_duration, num_segments, use_ffmpeg):
+    input_path = os.path.join(input_dir, filename)
+    print(f"Processing {input_path}...")
+    base_filename = os.path.splitext(filename)[0]
+    start_time = time.perf_counter()
+
+    process = _process_raw_video_ffmpeg if use_ffmpeg else _process_raw_video_moviepy
+    output_paths = process(input_path, output_dir, base_filename, segment_duration, num_segments)
+
+    return output_paths, time.perf_counter() - start_time
+
+
+def process_raw_videos(
+    input_dir,
+    output_dir,
+    segment_duration=10,
+    num_segments=1,
+    filenames=None,
+    workers=1,
+    use_ffmpeg=False,
+):
+    """
+    Processes each mp4 file in input_dir (or only `filenames`, when given): crops to 9:16,
+    splits into segments, and writes segments to output_dir.
+    Files are processed in a pool of `workers` processes, a failing file is logged and skipped.
+    With `use_ffmpeg` ffmpeg is called directly instead of decoding frames through moviepy.
+    Returns a dict mapping each successfully processed filename to the paths of its segments.
     """
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
 
-    for filename in os.listdir(input_dir):
-        if filename.lower().endswith(".mp4"):
-            input_path = os.path.join(input_dir, filename)
-            print(f"Processing {input_path}...")
-            clip = VideoFileClip(input_path)
-
-            # Crop the clip to phone aspect ratio
-            cropped_clip = crop_to_phone(clip)
-
-            base_filename = os.path.splitext(filename)[0]
-
-            for i in range(num_segments):
-                start = i * segment_duration
-                end = start + segment_duration
-                if end > cropped_clip.duration:
-                    end = cropped_clip.duration
-                segment = cropped_clip.subclip(start, end)
-                output_filename = f"{base_filename}_part{i+1}.mp4"
-                output_path = os.path.join(output_dir, output_filename)
-                print(f"  Writing segment {i+1} to {output_path}...")
-                segment.write_videofile(output_path, codec="libx264", audio_codec="aac", logger=None)
-
-            # Clean up
-            clip.close()
-            cropped_clip.close()
+    if filenames is None:
+        filenames = os.listdir(input_dir)
+    filenames = [filename for filename in filenames if filename.lower().endswith(".mp4")]
+
+    segment_paths = {}
+    start_time = time.perf_counter()
+    args = (segment_duration, num_segments, use_ffmpeg)
+
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(_process_raw_video, input_dir, output_dir, filename, *args): filename
+                for filename in filenames
+            }
+            results = ((futures[future], future) for future in as_completed(futures))
+            for filename, future in results:
+                _collect_result(filename, future.result, segment_paths)
+    else:
+        for filename in filenames:
+            _collect_result(
+                filename, lambda: _process_raw_video(input_dir, output_dir, filename, *args), segment_paths
+            )
+
+    elapsed = time.perf_counter() - start_time
+    logger.info(
+        f"Processed {len(segment_paths)} / {len(filenames)} raw videos in {elapsed:.1f}s "
+        f"({len(segment_paths) / elapsed if elapsed > 0 else 0:.2f} files/sec, {workers} workers)"
+    )
+    return segment_paths
+
+
+def _collect_result(filename, get_result, segment_paths):
+    try:
+        output_paths, elapsed = get_result()
+    except Exception as e:
+        logger.error(f"Processing {filename} failed: {e}")
+        return
+    logger.info(f"Processed {filename} in {elapsed:.2f}s")
+    segment_paths[filename] = output_paths
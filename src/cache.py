@@ -0,0 +1,144 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+# Memory hits are written back to the accessed_at column in batches of this size, or before an eviction
+TOUCH_BATCH_SIZE = 256
+
+
+class DiskCache:
+    """
+    Content-addressed key/value store for bytes, persisted in SQLite with an in-process LRU in front of it.
+    When `max_entries` is set, the least recently used entries are evicted from disk once the bound is exceeded.
+    """
+
+    def __init__(self, path, max_entries=None, memory_entries=1024):
+        out_directory = os.path.dirname(path)
+        if out_directory and not os.path.exists(out_directory):
+            os.makedirs(out_directory)
+
+        self.path = path
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._memory = OrderedDict()
+        self._touched = {}
+        self._lock = threading.RLock()
+        self._connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS cache_accessed_at ON cache (accessed_at)")
+        self._connection.commit()
+        self._size = self._connection.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    @staticmethod
+    def make_key(*parts):
+        """Hash the given parts into a cache key."""
+        digest = hashlib.sha256()
+        for part in parts:
+            digest.update(part if isinstance(part, bytes) else str(part).encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    @property
+    def hits(self):
+        return self.memory_hits + self.disk_hits
+
+    def get(self, key):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                self._touch(key)
+                return self._memory[key]
+
+            row = self._connection.execute("SELECT value FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            self._connection.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            self._connection.commit()
+            self.disk_hits += 1
+            self._remember(key, row[0])
+            return row[0]
+
+    def set(self, key, value):
+        with self._lock:
+            exists = self._connection.execute("SELECT 1 FROM cache WHERE key = ?", (key,)).fetchone() is not None
+            self._connection.execute(
+                "INSERT OR REPLACE INTO cache (key, value, accessed_at) VALUES (?, ?, ?)",
+                (key, value, time.time())
+            )
+            self._connection.commit()
+            if not exists:
+                self._size += 1
+            self._remember(key, value)
+            self._evict()
+
+    def _remember(self, key, value):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _touch(self, key):
+        self._touched[key] = time.time()
+        if len(self._touched) >= TOUCH_BATCH_SIZE:
+            self._flush_touched()
+
+    def _flush_touched(self):
+        """Write the access times of memory hits to disk, so eviction sees the hottest keys as recently used."""
+        if not self._touched:
+            return
+        self._connection.executemany(
+            "UPDATE cache SET accessed_at = ? WHERE key = ?", [(at, key) for key, at in self._touched.items()]
+        )
+        self._connection.commit()
+        self._touched.clear()
+
+    def _evict(self):
+        if self.max_entries is None or self._size <= self.max_entries:
+            return
+
+        self._flush_touched()
+        excess = self._size - self.max_entries
+        keys = [row[0] for row in self._connection.execute(
+            "SELECT key FROM cache ORDER BY accessed_at LIMIT ?", (excess,)
+        )]
+        self._connection.executemany("DELETE FROM cache WHERE key = ?", [(key,) for key in keys])
+        self._connection.commit()
+        for key in keys:
+            self._memory.pop(key, None)
+            self._touched.pop(key, None)
+        self._size -= len(keys)
+        self.evictions += len(keys)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": self._size,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def __len__(self):
+        return self._size
+
+    def close(self):
+        with self._lock:
+            self._flush_touched()
+            self._connection.close()
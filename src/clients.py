@@ -0,0 +1,93 @@
+import logging
+import os
+import threading
+import time
+
+
+# src.utils imports this module, so use its logger by name
+logger = logging.getLogger("TikTokGenerator")
+
+
+def _genai_client():
+    from google import genai
+    return genai.Client(api_key=os.environ["GEMINI_API_KEY"])
+
+
+def _text_to_speech_client():
+    from google.cloud import texttospeech_v1beta1 as texttospeech
+    return texttospeech.TextToSpeechClient()
+
+
+def _speech_client():
+    from google.cloud import speech_v1p1beta1 as speech
+    return speech.SpeechClient()
+
+
+DEFAULT_FACTORIES = {
+    "genai": _genai_client,
+    "texttospeech": _text_to_speech_client,
+    "speech": _speech_client,
+}
+
+
+class ClientRegistry:
+    """
+    Process-wide API clients, each built lazily on first use and then shared. The Google clients are thread-safe
+    and multiplex requests over their pooled HTTP/gRPC channels, so one client per process means one connection
+    setup (TLS handshake, auth) per API instead of one per agent. `set` injects a ready client, e.g. a stand-in
+    from src.fakes. `stats` reports how many clients were built and how long their setup took.
+    """
+
+    def __init__(self, factories=None):
+        self._factories = dict(DEFAULT_FACTORIES if factories is None else factories)
+        self._clients = {}
+        self._created = {}
+        self._setup_seconds = {}
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        client = self._clients.get(name)
+        if client is not None:
+            return client
+
+        with self._lock:
+            if name not in self._clients:
+                if name not in self._factories:
+                    raise KeyError(f"No client registered as {name}")
+                start_time = time.perf_counter()
+                self._clients[name] = self._factories[name]()
+                elapsed = time.perf_counter() - start_time
+                self._created[name] = self._created.get(name, 0) + 1
+                self._setup_seconds[name] = self._setup_seconds.get(name, 0.0) + elapsed
+                logger.debug(f"Created {name} client in {elapsed:.3f}s")
+            return self._clients[name]
+
+    def register(self, name, factory):
+        """Build the client with `factory` from now on, replacing the one built so far."""
+        with self._lock:
+            self._factories[name] = factory
+            self._clients.pop(name, None)
+
+    def set(self, name, client):
+        with self._lock:
+            self._clients[name] = client
+
+    def reset(self):
+        """Forget the clients built so far, the next `get` builds them again."""
+        with self._lock:
+            self._clients.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "clients": len(self._clients),
+                "created": dict(self._created),
+                "setup_seconds": dict(self._setup_seconds),
+            }
+
+
+registry = ClientRegistry()
+
+
+def get_client(name):
+    return registry.get(name)
@@ -0,0 +1,187 @@
+"""
+Local stand-ins for the remote API clients, used by the benchmarks and for offline runs.
+"""
+import asyncio
+import hashlib
+import io
+import random
+import re
+import threading
+import time
+import wave
+from datetime import timedelta
+from types import SimpleNamespace
+
+import numpy as np
+
+
+class FakeAPIError(Exception):
+    """Shaped like `google.genai.errors.APIError`, with a RetryInfo detail if `retry_delay` is given."""
+
+    def __init__(self, code, status, message="", retry_delay=None):
+        super().__init__(f"{code} {status}. {message}")
+        self.code = code
+        self.status = status
+        self.response = None
+        details = []
+        if retry_delay is not None:
+            details.append({"@type": "type.googleapis.com/google.rpc.RetryInfo", "retryDelay": f"{retry_delay}s"})
+        self.details = {"error": {"code": code, "status": status, "message": message, "details": details}}
+
+
+def _maybe_fail(error_rate, retry_delay=None):
+    if error_rate and random.random() < error_rate:
+        raise FakeAPIError(429, "RESOURCE_EXHAUSTED", "Simulated rate limit", retry_delay)
+
+
+def _simulate_request(latency, error_rate, retry_delay=None):
+    time.sleep(latency)
+    _maybe_fail(error_rate, retry_delay)
+
+
+def default_responder(contents):
+    return "['A passenger jet climbing after take-off against a clear blue sky']"
+
+
+class FakeModels:
+    def __init__(self, dimension=768, latency=0.0, error_rate=0.0, responder=default_responder, retry_delay=None):
+        self.dimension = dimension
+        self.latency = latency
+        self.error_rate = error_rate
+        self.retry_delay = retry_delay
+        self.responder = responder
+        self.embed_calls = 0
+        self.generate_calls = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, model, contents, config=None):
+        with self._lock:
+            self.generate_calls += 1
+        _simulate_request(self.latency, self.error_rate, self.retry_delay)
+        return SimpleNamespace(text=self.responder(contents))
+
+    def embed_content(self, model, contents):
+        with self._lock:
+            self.embed_calls += 1
+        time.sleep(self.latency)
+        return SimpleNamespace(
+            embeddings=[SimpleNamespace(values=self._embed(model, text)) for text in contents]
+        )
+
+    def _embed(self, model, text):
+        seed = int.from_bytes(hashlib.sha256(f"{model}\0{text}".encode()).digest()[:8], "little")
+        return np.random.default_rng(seed).standard_normal(self.dimension).astype(np.float32).tolist()
+
+
+class FakeFiles:
+    def __init__(self, latency=0.0, error_rate=0.0):
+        self.latency = latency
+        self.error_rate = error_rate
+
+    def upload(self, file):
+        _simulate_request(self.latency, self.error_rate)
+        return SimpleNamespace(name=f"files/{hashlib.sha1(str(file).encode()).hexdigest()[:12]}", uri=str(file))
+
+
+class FakeAsyncModels:
+    """`client.aio.models` counterpart of FakeModels, sharing its settings and call counts."""
+
+    def __init__(self, models):
+        self._models = models
+
+    async def generate_content(self, model, contents, config=None):
+        with self._models._lock:
+            self._models.generate_calls += 1
+        await asyncio.sleep(self._models.latency)
+        _maybe_fail(self._models.error_rate, self._models.retry_delay)
+        return SimpleNamespace(text=self._models.responder(contents))
+
+
+class FakeGenaiClient:
+    """
+    Mimics the parts of `genai.Client` used by the agents, including `aio`. Every request sleeps `latency` seconds
+    and fails with a 429 error with probability `error_rate`, asking to retry after `retry_delay` seconds if given.
+    """
+
+    def __init__(self, dimension=768, latency=0.0, error_rate=0.0, responder=default_responder, retry_delay=None):
+        self.models = FakeModels(
+            dimension=dimension, latency=latency, error_rate=error_rate, responder=responder, retry_delay=retry_delay
+        )
+        self.files = FakeFiles(latency=latency, error_rate=error_rate)
+        self.aio = SimpleNamespace(models=FakeAsyncModels(self.models))
+
+
+class FakeSpeechClient:
+    """
+    Mimics `speech.SpeechClient.recognize`: after `latency` seconds it returns `words_per_second`
+    evenly spaced words over the duration of the submitted WAV audio.
+    """
+
+    def __init__(self, latency=0.0, words_per_second=2.5):
+        self.latency = latency
+        self.words_per_second = words_per_second
+        self.recognize_calls = 0
+        self._lock = threading.Lock()
+
+    def recognize(self, config, audio):
+        with self._lock:
+            self.recognize_calls += 1
+        time.sleep(self.latency)
+
+        with wave.open(io.BytesIO(audio.content)) as wav:
+            duration = wav.getnframes() / wav.getframerate()
+
+        step = 1 / self.words_per_second
+        words = [
+            SimpleNamespace(
+                word=f"word{i}",
+                start_time=timedelta(seconds=i * step),
+                end_time=timedelta(seconds=i * step + 0.8 * step),
+            )
+            for i in range(int(duration * self.words_per_second))
+        ]
+        return SimpleNamespace(results=[SimpleNamespace(alternatives=[SimpleNamespace(words=words)])])
+
+
+class FakeTextToSpeechClient:
+    """
+    Mimics `texttospeech.TextToSpeechClient.synthesize_speech`: after `latency` seconds it returns 16-bit mono
+    WAV audio lasting `seconds_per_word` per word, with SSML mark timepoints when they are requested.
+    """
+
+    def __init__(self, latency=0.0, seconds_per_word=0.4, sample_rate=24000):
+        self.latency = latency
+        self.seconds_per_word = seconds_per_word
+        self.sample_rate = sample_rate
+        self.synthesize_calls = 0
+        self._lock = threading.Lock()
+
+    def synthesize_speech(self, request=None, input=None, voice=None, audio_config=None):
+        with self._lock:
+            self.synthesize_calls += 1
+        time.sleep(self.latency)
+
+        if request is not None:
+            input = request.input
+        timepoints = []
+        if input.ssml:
+            # Every word is preceded by its mark, marks after the last word fall at the end of the audio
+            num_words = 0
+            for mark, text in re.findall(r'<mark name="([^"]*)"/>([^<]*)', input.ssml):
+                timepoints.append(SimpleNamespace(mark_name=mark, time_seconds=num_words * self.seconds_per_word))
+                num_words += len(text.split())
+            if request is None or not request.enable_time_pointing:
+                timepoints = []
+        else:
+            num_words = len(input.text.split())
+
+        num_frames = int(num_words * self.seconds_per_word * self.sample_rate)
+        t = np.arange(num_frames) / self.sample_rate
+        samples = (3000 * np.sin(2 * np.pi * 220 * t)).astype("<i2")
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(self.sample_rate)
+            wav.writeframes(samples.tobytes())
+        return SimpleNamespace(audio_content=buffer.getvalue(), timepoints=timepoints)
@@ -0,0 +1,29 @@
+import subprocess
+
+from moviepy.config import get_setting
+from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+
+
+def run_ffmpeg(args, input=None):
+    """
+    Run the ffmpeg binary used by moviepy with the given arguments, raising RuntimeError with
+    ffmpeg's stderr if it fails.
+    """
+    command = [get_setting("FFMPEG_BINARY"), "-hide_banner", "-loglevel", "error", "-nostdin", "-y", *map(str, args)]
+    if input is not None:
+        command.remove("-nostdin")
+    result = subprocess.run(command, input=input, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed ({result.returncode}): {result.stderr.decode(errors='replace').strip()}")
+    return result.stdout
+
+
+def probe(path):
+    """Return size, duration, fps and whether the file has an audio stream."""
+    infos = ffmpeg_parse_infos(str(path))
+    return {
+        "size": infos["video_size"],
+        "duration": infos["duration"],
+        "fps": infos["video_fps"],
+        "audio": infos["audio_found"],
+    }
@@ -0,0 +1,185 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+
+JOB_STORE_PATH = "cache/jobs.sqlite"
+# Channel of jobs whose params name none, e.g. those enqueued before jobs had channels
+DEFAULT_CHANNEL = "default"
+
+
+class LeaseLost(RuntimeError):
+    """Raised when a worker updates a job whose lease has expired and was claimed by another worker."""
+
+
+def make_worker_id():
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+
+class JobStore:
+    """
+    Durable job queue in SQLite. A job has JSON params, the last completed stage and the artifacts the
+    stages have produced so far. Workers claim pending jobs with a lease of `lease_seconds`, which every
+    checkpoint renews; a job whose worker died becomes claimable again when its lease expires and is resumed
+    from its last completed stage. Several processes can drain the same database.
+    """
+
+    def __init__(self, path, lease_seconds=1800):
+        out_directory = os.path.dirname(path)
+        if out_directory and not os.path.exists(out_directory):
+            os.makedirs(out_directory)
+
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self._lock = threading.RLock()
+        # Autocommit, updates run in explicit transactions (see _transaction)
+        self._connection = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, run_id TEXT NOT NULL, position INTEGER NOT NULL, "
+            "status TEXT NOT NULL DEFAULT 'pending', stage TEXT, params TEXT NOT NULL, "
+            "artifacts TEXT NOT NULL DEFAULT '{}', attempts INTEGER NOT NULL DEFAULT 0, error TEXT, "
+            "lease_owner TEXT, lease_expires_at REAL, updated_at REAL NOT NULL)"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS jobs_run_status ON jobs (run_id, status, position)")
+
+    def enqueue(self, run_id, jobs):
+        """Append (job_id, params) pairs to the run in order. Jobs which already exist are left untouched."""
+        with self._transaction():
+            start = self._connection.execute(
+                "SELECT COALESCE(MAX(position) + 1, 0) FROM jobs WHERE run_id = ?", (run_id,)
+            ).fetchone()[0]
+            self._connection.executemany(
+                "INSERT OR IGNORE INTO jobs (id, run_id, position, params, updated_at) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (job_id, run_id, start + offset, json.dumps(params), time.time())
+                    for offset, (job_id, params) in enumerate(jobs)
+                ]
+            )
+
+    def claim(self, worker_id, run_id):
+        """
+        Lease the next pending job of the run which nobody holds, or return None if there is none. Jobs whose lease
+        expired are taken over, except those of `worker_id` itself, which are still in flight.
+        """
+        now = time.time()
+        with self._transaction():
+            row = self._connection.execute(
+                "SELECT id FROM jobs WHERE run_id = ? AND status = 'pending' "
+                "AND (lease_owner IS NULL OR (lease_expires_at < ? AND lease_owner != ?)) ORDER BY position LIMIT 1",
+                (run_id, now, worker_id)
+            ).fetchone()
+            if row is not None:
+                self._connection.execute(
+                    "UPDATE jobs SET lease_owner = ?, lease_expires_at = ?, updated_at = ? WHERE id = ?",
+                    (worker_id, now + self.lease_seconds, now, row[0])
+                )
+        return None if row is None else self.get(row[0])
+
+    def checkpoint(self, job_id, worker_id, stage, **artifacts):
+        """Record `stage` as completed with the artifacts it produced and renew the lease."""
+        now = time.time()
+        with self._transaction():
+            row = self._held(job_id, worker_id)
+            merged = {**json.loads(row[0]), **artifacts}
+            self._connection.execute(
+                "UPDATE jobs SET stage = ?, artifacts = ?, lease_expires_at = ?, updated_at = ? WHERE id = ?",
+                (stage, json.dumps(merged), now + self.lease_seconds, now, job_id)
+            )
+
+    def renew(self, job_ids, worker_id):
+        """Extend the leases `worker_id` holds on the jobs, e.g. while they wait in a queue between checkpoints."""
+        now = time.time()
+        with self._transaction():
+            self._connection.executemany(
+                "UPDATE jobs SET lease_expires_at = ?, updated_at = ? WHERE id = ? AND lease_owner = ?",
+                [(now + self.lease_seconds, now, job_id, worker_id) for job_id in job_ids]
+            )
+
+    def complete(self, job_id, worker_id):
+        with self._transaction():
+            self._held(job_id, worker_id)
+            self._connection.execute(
+                "UPDATE jobs SET status = 'done', error = NULL, lease_owner = NULL, lease_expires_at = NULL, "
+                "updated_at = ? WHERE id = ?",
+                (time.time(), job_id)
+            )
+
+    def fail(self, job_id, worker_id, error, max_attempts=3):
+        """Count a failed attempt and release the job, it stays pending until `max_attempts` attempts failed."""
+        with self._transaction():
+            self._held(job_id, worker_id)
+            self._connection.execute(
+                "UPDATE jobs SET attempts = attempts + 1, error = ?, "
+                "status = CASE WHEN attempts + 1 >= ? THEN 'failed' ELSE 'pending' END, "
+                "lease_owner = NULL, lease_expires_at = NULL, updated_at = ? WHERE id = ?",
+                (str(error), max_attempts, time.time(), job_id)
+            )
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT id, run_id, status, stage, params, artifacts, attempts, error FROM jobs WHERE id = ?",
+                (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "id": row[0],
+            "run_id": row[1],
+            "status": row[2],
+            "stage": row[3],
+            "params": json.loads(row[4]),
+            "artifacts": json.loads(row[5]),
+            "attempts": row[6],
+            "error": row[7],
+        }
+
+    def params(self, run_id):
+        """Params of all jobs of the run, in order."""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT params FROM jobs WHERE run_id = ? ORDER BY position", (run_id,)
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def summary(self, run_id):
+        """Number of jobs of the run per status."""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT status, COUNT(*) FROM jobs WHERE run_id = ? GROUP BY status", (run_id,)
+            ).fetchall()
+        return dict(rows)
+
+    def _held(self, job_id, worker_id):
+        row = self._connection.execute(
+            "SELECT artifacts, lease_owner FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        if row is None:
+            raise KeyError(job_id)
+        # An expired lease is still ours as long as no other worker has claimed the job
+        if row[1] != worker_id:
+            raise LeaseLost(f"Job {job_id} is no longer leased by {worker_id}")
+        return row
+
+    @contextmanager
+    def _transaction(self):
+        # BEGIN IMMEDIATE takes the database write lock up front, so concurrent claims can't pick the same job
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+            self._connection.execute("COMMIT")
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
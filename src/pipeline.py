@@ -0,0 +1,190 @@
+import multiprocessing
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, NamedTuple
+
+from src.utils import logger
+
+
+_DONE = object()
+
+
+class Stage(NamedTuple):
+    """
+    One step of a Pipeline: `func` takes an item and returns the item for the next stage.
+    Up to `workers` items are processed at a time, on threads or, with `processes`, in a process pool
+    (then `func` and the items must be picklable).
+    """
+    name: str
+    func: Callable[[Any], Any]
+    workers: int = 1
+    processes: bool = False
+
+
+class PipelineResult(NamedTuple):
+    outputs: list
+    failures: list  # (stage name, item, exception)
+    report: dict
+
+
+class Pipeline:
+    """
+    Runs items through a sequence of stages connected by bounded queues, so that every stage works on
+    a different item at the same time and the throughput approaches that of the slowest stage.
+    An item failing in a stage is logged and dropped, the other items carry on; `on_failure`, if given, is called
+    right away with (stage name, item, exception).
+    """
+
+    def __init__(self, stages, queue_size=2, report_interval=60.0, sample_interval=0.5, on_failure=None):
+        self.stages = list(stages)
+        self.on_failure = on_failure
+        self.queue_size = queue_size
+        self.report_interval = report_interval
+        self.sample_interval = sample_interval
+
+    def run(self, items) -> PipelineResult:
+        self._queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+        self._lock = threading.Lock()
+        self._remaining_workers = [stage.workers for stage in self.stages]
+        self._processed = [0] * len(self.stages)
+        self._failed = [0] * len(self.stages)
+        self._busy = [0.0] * len(self.stages)
+        self._max_depth = [0] * len(self.stages)
+        self._depth_sum = [0] * len(self.stages)
+        self._samples = 0
+        self._outputs = []
+        self._failures = []
+        self._start_time = time.perf_counter()
+
+        # Spawned rather than forked: the parent is multi-threaded and holds SQLite and gRPC connections,
+        # which a forked child must not inherit
+        executors = [
+            ProcessPoolExecutor(max_workers=stage.workers, mp_context=multiprocessing.get_context("spawn"))
+            if stage.processes else None
+            for stage in self.stages
+        ]
+        threads = [threading.Thread(target=self._feed, args=(items,), daemon=True)]
+        for index, stage in enumerate(self.stages):
+            threads += [
+                threading.Thread(target=self._work, args=(index, executors[index]), daemon=True)
+                for _ in range(stage.workers)
+            ]
+
+        stop_monitor = threading.Event()
+        monitor = threading.Thread(target=self._monitor, args=(stop_monitor,), daemon=True)
+        try:
+            monitor.start()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            stop_monitor.set()
+            monitor.join()
+            for executor in executors:
+                if executor is not None:
+                    executor.shutdown()
+
+        report = self.report()
+        logger.info(f"Pipeline finished: {self._format_report(report)}")
+        return PipelineResult(self._outputs, self._failures, report)
+
+    def report(self):
+        """Per stage: items processed and failed, utilization of its workers and depth of its input queue."""
+        elapsed = time.perf_counter() - self._start_time
+        with self._lock:
+            samples = max(self._samples, 1)
+            stages = {
+                stage.name: {
+                    "workers": stage.workers,
+                    "processed": self._processed[index],
+                    "failed": self._failed[index],
+                    "utilization": self._busy[index] / (stage.workers * elapsed) if elapsed > 0 else 0.0,
+                    "queue_depth": self._queues[index].qsize(),
+                    "max_queue_depth": self._max_depth[index],
+                    "mean_queue_depth": self._depth_sum[index] / samples,
+                }
+                for index, stage in enumerate(self.stages)
+            }
+            completed = len(self._outputs)
+        return {
+            "elapsed": elapsed,
+            "completed": completed,
+            "throughput_per_hour": 3600 * completed / elapsed if elapsed > 0 else 0.0,
+            "stages": stages,
+        }
+
+    def _feed(self, items):
+        try:
+            for item in items:
+                self._queues[0].put(item)
+        except Exception as e:
+            logger.error(f"Pipeline input failed: {e}")
+        finally:
+            for _ in range(self.stages[0].workers):
+                self._queues[0].put(_DONE)
+
+    def _work(self, index, executor):
+        stage = self.stages[index]
+        is_last = index == len(self.stages) - 1
+        while True:
+            item = self._queues[index].get()
+            if item is _DONE:
+                break
+
+            start_time = time.perf_counter()
+            try:
+                result = executor.submit(stage.func, item).result() if executor else stage.func(item)
+            except Exception as e:
+                logger.error(f"Pipeline stage {stage.name} failed: {e}")
+                with self._lock:
+                    self._failed[index] += 1
+                    self._busy[index] += time.perf_counter() - start_time
+                    self._failures.append((stage.name, item, e))
+                if self.on_failure is not None:
+                    try:
+                        self.on_failure(stage.name, item, e)
+                    except Exception as callback_error:
+                        logger.error(f"Pipeline failure callback failed: {callback_error}")
+                continue
+
+            with self._lock:
+                self._processed[index] += 1
+                self._busy[index] += time.perf_counter() - start_time
+            if is_last:
+                with self._lock:
+                    self._outputs.append(result)
+            else:
+                self._queues[index + 1].put(result)
+
+        with self._lock:
+            self._remaining_workers[index] -= 1
+            stage_finished = self._remaining_workers[index] == 0
+        if stage_finished and not is_last:
+            for _ in range(self.stages[index + 1].workers):
+                self._queues[index + 1].put(_DONE)
+
+    def _monitor(self, stop):
+        last_report = time.perf_counter()
+        while not stop.wait(self.sample_interval):
+            with self._lock:
+                self._samples += 1
+                for index, stage_queue in enumerate(self._queues):
+                    depth = stage_queue.qsize()
+                    self._max_depth[index] = max(self._max_depth[index], depth)
+                    self._depth_sum[index] += depth
+
+            if time.perf_counter() - last_report >= self.report_interval:
+                last_report = time.perf_counter()
+                logger.info(f"Pipeline progress: {self._format_report(self.report())}")
+
+    @staticmethod
+    def _format_report(report):
+        stages = ", ".join(
+            f"{name} [queue {stats['queue_depth']} (max {stats['max_queue_depth']}), "
+            f"{100 * stats['utilization']:.0f}% busy, {stats['processed']} done, {stats['failed']} failed]"
+            for name, stats in report["stages"].items()
+        )
+        return f"{report['completed']} completed in {report['elapsed']:.1f}s; {stages}"
@@ -0,0 +1,129 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+
+PERIOD_SECONDS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+# e.g. "requests_per_minute" or "units_per_day"
+LIMIT_PATTERN = re.compile(r"^(?P<unit>\w+)_per_(?P<period>second|minute|hour|day)$")
+
+
+class QuotaBudgets:
+    """
+    Token buckets for API quotas. A bucket is named "<api>.<limit>", e.g. "gemini.requests_per_minute", and refills
+    its whole limit evenly over the period. The levels of the buckets live in SQLite at `path` (e.g. the job store
+    database), so every process using the same file, including one restarted after a crash, draws from the same
+    budgets; the default ":memory:" keeps them in this process only.
+
+    Work is admitted with `try_reserve` for its estimated cost, e.g. {"gemini": {"requests": 4}}: either all
+    buckets of the APIs involved have enough tokens and are charged, or none is. `charge` spends tokens
+    unconditionally, for work that is done anyway (e.g. a retry), which can leave a bucket in debt.
+    """
+
+    def __init__(self, limits, path=":memory:", clock=time.time):
+        """`limits` maps an API name to its limits, e.g. {"youtube": {"units_per_day": 10000}}."""
+        self.clock = clock
+        # Bucket name -> (api, unit, refill rate per second, capacity)
+        self.buckets = {}
+        for api, api_limits in limits.items():
+            for limit, amount in api_limits.items():
+                match = LIMIT_PATTERN.match(limit)
+                if match is None:
+                    raise ValueError(f"Unknown quota limit {api}.{limit}, expected <unit>_per_<second|minute|hour|day>")
+                self.buckets[f"{api}.{limit}"] = (api, match["unit"], amount / PERIOD_SECONDS[match["period"]], amount)
+
+        out_directory = os.path.dirname(path)
+        if out_directory and not os.path.exists(out_directory):
+            os.makedirs(out_directory)
+        self._lock = threading.RLock()
+        # Autocommit, updates run in explicit transactions (see _transaction)
+        self._connection = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS quota_buckets ("
+            "name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+        with self._transaction():
+            # New buckets start full, existing ones keep the level other processes left them at
+            self._connection.executemany(
+                "INSERT OR IGNORE INTO quota_buckets (name, tokens, updated_at) VALUES (?, ?, ?)",
+                [(name, capacity, self.clock()) for name, (_, _, _, capacity) in self.buckets.items()]
+            )
+
+    def _charges(self, cost):
+        charges = {}
+        for name, (api, unit, _, capacity) in self.buckets.items():
+            tokens = cost.get(api, {}).get(unit, 0)
+            if tokens > capacity:
+                raise ValueError(f"A cost of {tokens} exceeds the whole {name} budget")
+            if tokens:
+                charges[name] = tokens
+        return charges
+
+    def _levels(self, now):
+        """Tokens in every bucket at `now`, refilled since they were last updated."""
+        rows = self._connection.execute("SELECT name, tokens, updated_at FROM quota_buckets").fetchall()
+        levels = {}
+        for name, tokens, updated_at in rows:
+            if name in self.buckets:
+                _, _, rate, capacity = self.buckets[name]
+                levels[name] = min(capacity, tokens + max(0.0, now - updated_at) * rate)
+        return levels
+
+    def _spend(self, levels, charges, now):
+        self._connection.executemany(
+            "UPDATE quota_buckets SET tokens = ?, updated_at = ? WHERE name = ?",
+            [(levels[name] - tokens, now, name) for name, tokens in charges.items()]
+        )
+
+    def try_reserve(self, cost):
+        """Charge `cost` to all budgets if every one of them can afford it now."""
+        charges = self._charges(cost)
+        now = self.clock()
+        with self._transaction():
+            levels = self._levels(now)
+            if any(levels[name] < tokens for name, tokens in charges.items()):
+                return False
+            self._spend(levels, charges, now)
+        return True
+
+    def charge(self, cost):
+        """Charge `cost` to all budgets whether they can afford it or not."""
+        charges = self._charges(cost)
+        now = self.clock()
+        with self._transaction():
+            self._spend(self._levels(now), charges, now)
+
+    def wait_time(self, cost):
+        """Seconds until every budget can afford `cost`."""
+        charges = self._charges(cost)
+        with self._lock:
+            levels = self._levels(self.clock())
+        return max(
+            (max(0.0, (tokens - levels[name]) / self.buckets[name][2]) for name, tokens in charges.items()),
+            default=0.0
+        )
+
+    def usage(self):
+        """Remaining tokens per bucket."""
+        with self._lock:
+            levels = self._levels(self.clock())
+        return {name: round(tokens, 1) for name, tokens in levels.items()}
+
+    @contextmanager
+    def _transaction(self):
+        # BEGIN IMMEDIATE takes the database write lock up front, so two processes can't spend the same tokens
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+            self._connection.execute("COMMIT")
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,90 @@
+import json
+from contextlib import contextmanager
+
+from src.cache import DiskCache
+
+
+MODES = ("record", "replay", "passthrough")
+RESPONSE_STORE_PATH = "cache/responses.sqlite"
+
+
+class ResponseNotRecorded(LookupError):
+    """Raised in replay mode for a request which has no recorded response."""
+
+
+def _stable_repr(value):
+    """Serialize prompt contents or generation params deterministically for hashing."""
+    if hasattr(value, "model_dump"):
+        value = value.model_dump(mode="json", exclude_none=True)
+    return json.dumps(value, sort_keys=True, default=str)
+
+
+class ResponseStore:
+    """
+    Persistent store of LLM responses keyed by (model, prompt contents, generation params), backed by a DiskCache.
+
+    Modes:
+    - record: recorded responses are served, other requests go to the model and their responses are recorded
+    - replay: only recorded responses are served, other requests raise ResponseNotRecorded (no network needed)
+    - passthrough: every request goes to the model and nothing is read or written
+
+    `namespace` is part of every key, so that identical prompts in different jobs (e.g. the first prompt for
+    every video on a topic) get their own responses. `namespaced` returns a view sharing the same database.
+
+    Within `deferred`, responses are recorded only once the block completes, so a response the caller rejects
+    (by raising) is never served again and a retry asks the model anew.
+    """
+
+    def __init__(self, path, mode="record", namespace="", cache=None):
+        if mode not in MODES:
+            raise ValueError(f"Unknown response store mode: {mode}, expected one of {MODES}")
+        self.mode = mode
+        self.namespace = namespace
+        self.cache = cache if cache is not None else (DiskCache(path) if mode != "passthrough" else None)
+        self.path = path
+        self._pending = None
+
+    def namespaced(self, namespace):
+        return ResponseStore(self.path, self.mode, namespace, self.cache)
+
+    def make_key(self, model, contents, config=None):
+        return DiskCache.make_key(self.namespace, model, _stable_repr(contents), _stable_repr(config))
+
+    def lookup(self, key):
+        """The recorded response for the key or None if the request should go to the model."""
+        if self.mode == "passthrough":
+            return None
+
+        recorded = self.cache.get(key)
+        if recorded is not None:
+            return recorded.decode("utf-8")
+        if self.mode == "replay":
+            raise ResponseNotRecorded(f"No recorded response for request {key}")
+        return None
+
+    def record(self, key, response):
+        if self.mode == "record" and response is not None:
+            if self._pending is not None:
+                self._pending[key] = response
+            else:
+                self.cache.set(key, response.encode("utf-8"))
+
+    @contextmanager
+    def deferred(self):
+        """Hold back the responses recorded in the block, they are written if it completes and dropped if it raises."""
+        if self._pending is not None:
+            # Nested, the outermost block decides
+            yield
+            return
+
+        self._pending = {}
+        try:
+            yield
+            pending = self._pending
+        finally:
+            self._pending = None
+        for key, response in pending.items():
+            self.cache.set(key, response.encode("utf-8"))
+
+    def stats(self):
+        return {"mode": self.mode, **(self.cache.stats() if self.cache is not None else {})}
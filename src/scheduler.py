@@ -0,0 +1,302 @@
+"""
+Schedules videos for several channels and topics against shared API quota budgets.
+
+A plan (see config/plan.example.json) lists the channels, the topics of every channel with the number of videos
+per day, and the quotas of the APIs. Every video is admitted for its estimated cost in all quotas; the next video
+is the least complete (channel, topic) target whose cost fits the budgets now, so a topic waiting for one quota
+does not hold back the others. A failed video tried again is charged once more. The budgets are kept in the job
+store database, shared by all processes working on runs there and surviving restarts.
+
+    python -m src.scheduler config/plan.json --run-id 20250101
+    python -m src.scheduler config/plan.json --dry-run --hours 24
+"""
+import argparse
+import functools
+import json
+import time
+from collections import Counter
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+from dotenv import load_dotenv
+
+from src.job_store import DEFAULT_CHANNEL, JOB_STORE_PATH, JobStore
+from src.quota import QuotaBudgets
+from src.utils import logger
+
+
+DAY_SECONDS = 86400
+# Shortest wait for the budgets to refill, rounding can leave a bucket a fraction of a token short after waiting
+MIN_WAIT_SECONDS = 1.0
+# Estimated requests per video: the structured script and the clip search with its query embedding on Gemini,
+# one TTS request per sentence of the narration and a YouTube upload (1600 units)
+DEFAULT_VIDEO_COST = {
+    "gemini": {"requests": 3},
+    "texttospeech": {"requests": 12, "characters": 1500},
+    "youtube": {"units": 1600},
+}
+
+
+class TopicPlan(NamedTuple):
+    topic: str
+    videos_per_day: float
+    category_id: Optional[str] = None
+    description: Optional[str] = None
+
+
+class ChannelPlan(NamedTuple):
+    name: str
+    topics: list
+    # None for the default token of src.uploaders.yt_upload
+    token_path: Optional[str] = None
+    # Quota the channel's uploads are charged to: channels of one Google Cloud project share its YouTube quota
+    youtube_quota: str = "youtube"
+
+
+class Plan(NamedTuple):
+    channels: list
+    quotas: dict
+    video_cost: dict = DEFAULT_VIDEO_COST
+    time_per_base_video: int = 7
+
+    def targets(self):
+        return [(channel, topic) for channel in self.channels for topic in channel.topics]
+
+    def cost(self, channel):
+        """Estimated cost of a video of the channel, with its uploads charged to the channel's YouTube quota."""
+        cost = {api: dict(units) for api, units in self.video_cost.items() if api != "youtube"}
+        cost[channel.youtube_quota] = dict(self.video_cost.get("youtube", {}))
+        return cost
+
+
+def load_plan(path):
+    with open(path, "r") as plan_file:
+        plan = json.load(plan_file)
+
+    channels = [
+        ChannelPlan(**{
+            **channel,
+            "topics": [TopicPlan(**topic) for topic in channel["topics"]],
+        })
+        for channel in plan["channels"]
+    ]
+    names = [channel.name for channel in channels]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Channel names must be unique: {names}")
+    return Plan(
+        channels=channels,
+        quotas=plan["quotas"],
+        video_cost=plan.get("video_cost", DEFAULT_VIDEO_COST),
+        time_per_base_video=plan.get("time_per_base_video", 7),
+    )
+
+
+class Scheduler:
+    """
+    Admits the videos of a plan one at a time, see `next_job`. `counts` are the videos already scheduled per
+    (channel, topic), e.g. by an earlier attempt of the run. Targets are the videos per day scaled to `horizon`
+    seconds; once they are met, or the budgets can't afford any more video within the horizon, scheduling stops.
+    `clock` and `sleep` can be replaced to simulate the schedule.
+    """
+
+    def __init__(self, plan, budgets, clock=time.monotonic, sleep=time.sleep, counts=None, horizon=DAY_SECONDS):
+        self.plan = plan
+        self.budgets = budgets
+        self.clock = clock
+        self.sleep = sleep
+        self.horizon = horizon
+        self.deadline = clock() + horizon
+        self.counts = Counter(counts or {})
+        self.targets = {
+            (channel.name, topic.topic): topic.videos_per_day * horizon / DAY_SECONDS
+            for channel, topic in plan.targets()
+        }
+        self.costs = {channel.name: plan.cost(channel) for channel in plan.channels}
+
+    @classmethod
+    def counts_from(cls, job_store, run_id):
+        """Videos per (channel, topic) already in the job store for the run."""
+        return Counter(
+            (params.get("channel", DEFAULT_CHANNEL), params["topic"]) for params in job_store.params(run_id)
+        )
+
+    def _remaining(self):
+        # Least complete first, plan order breaks ties
+        remaining = [key for key, target in self.targets.items() if self.counts[key] < target]
+        return sorted(remaining, key=lambda key: self.counts[key] / self.targets[key])
+
+    def next_job(self, run_id):
+        """
+        Reserve the budget for the next video and return it as (job_id, params), waiting for the budgets to refill
+        if no video is affordable now. None when all targets are met or can't be within the horizon.
+        """
+        while True:
+            remaining = self._remaining()
+            if not remaining:
+                logger.info(f"All targets met: {dict(self.counts)}")
+                return None
+
+            for channel, topic in remaining:
+                if self.budgets.try_reserve(self.costs[channel]):
+                    video_num = self.counts[(channel, topic)]
+                    self.counts[(channel, topic)] += 1
+                    params = {
+                        "channel": channel,
+                        "topic": topic,
+                        "video_num": video_num,
+                        "time_per_base_video": self.plan.time_per_base_video,
+                    }
+                    return f"{run_id}/{channel}/{topic}/{video_num}", params
+
+            wait_time = max(
+                MIN_WAIT_SECONDS, min(self.budgets.wait_time(self.costs[channel]) for channel, _ in remaining)
+            )
+            if self.clock() + wait_time > self.deadline:
+                logger.warning(f"Quota budgets can't afford the remaining videos in time: {self.unmet()}")
+                return None
+            logger.info(f"Quota budgets exhausted, waiting {wait_time:.0f} seconds: {self.budgets.usage()}")
+            self.sleep(wait_time)
+
+    def charge_retry(self, params):
+        """Charge the budgets for a failed video which is tried again."""
+        channel = params.get("channel", DEFAULT_CHANNEL)
+        cost = self.costs.get(channel) or self.plan.cost(ChannelPlan(channel, []))
+        self.budgets.charge(cost)
+
+    def unmet(self):
+        """Videos missing per (channel, topic) target."""
+        return {
+            f"{channel}/{topic}": round(target - self.counts[(channel, topic)], 1)
+            for (channel, topic), target in self.targets.items()
+            if self.counts[(channel, topic)] < target
+        }
+
+
+def run(plan_path, run_id=None, job_store_path=JOB_STORE_PATH, **pipeline_options):
+    """Generate and upload the videos of the plan, see generate_videos.run_jobs."""
+    # Imported here, the dry run needs neither the video stack nor the YouTube client
+    from src.uploaders.yt_upload import TOKEN_PATH, authenticate_youtube, register_topic, upload_shorts
+    from src.video_generator.generate_videos import ENV_PATH, run_jobs
+
+    run_id = run_id or time.strftime("%Y%m%d-%H%M%S")
+    load_dotenv(dotenv_path=Path(ENV_PATH))
+    plan = load_plan(plan_path)
+
+    uploaders = {}
+    for channel in plan.channels:
+        for topic in channel.topics:
+            register_topic(topic.topic, category_id=topic.category_id, description=topic.description)
+        youtube = authenticate_youtube(token_path=channel.token_path or TOKEN_PATH)
+        uploaders[channel.name] = functools.partial(upload_shorts, youtube)
+
+    # Budgets live next to the jobs, so every process on this database and every restart draw from the same ones
+    budgets = QuotaBudgets(plan.quotas, path=job_store_path)
+    job_store = JobStore(job_store_path)
+    counts = Scheduler.counts_from(job_store, run_id)
+    scheduler = Scheduler(plan, budgets, counts=counts)
+    logger.info(f"Scheduling run {run_id}: targets {scheduler.targets}, already scheduled {dict(counts)}")
+
+    def admit():
+        # Other processes on the run admit videos too
+        scheduler.counts |= Scheduler.counts_from(job_store, run_id)
+        return scheduler.next_job(run_id)
+
+    return run_jobs(
+        run_id,
+        admit=admit,
+        on_retry=scheduler.charge_retry,
+        uploaders=uploaders,
+        job_store_path=job_store_path,
+        **pipeline_options,
+    )
+
+
+def _sample_video_cost(topic):
+    """Requests and characters one video actually costs on the fake Gemini and TTS clients."""
+    from src.fakes import FakeGenaiClient, FakeTextToSpeechClient
+    from src.video_generator.audio_generation_agent import TIMEPOINTS_VOICE, AudioGenerationAgent
+    from src.video_generator.script_writer_agent import ScriptWriterAgent
+
+    sentence = f"Here is one more surprising fact about {topic} that most people never hear about."
+    response = json.dumps({
+        "question": f"What is the most surprising fact about {topic}?",
+        "script": " ".join([sentence] * 10),
+        "title": f"Surprising facts about {topic}",
+        "tags": ["facts", "shorts", "learning"],
+    })
+    genai_client = FakeGenaiClient(responder=lambda contents: response)
+    tts_client = FakeTextToSpeechClient()
+
+    script, _, _ = ScriptWriterAgent(client=genai_client, mode="structured").generate(topic)
+    AudioGenerationAgent(voice_name=TIMEPOINTS_VOICE, word_timings=True, client=tts_client).generate_narration(script)
+    return {
+        "gemini": {"requests": genai_client.models.generate_calls},
+        "texttospeech": {"requests": tts_client.synthesize_calls, "characters": len(script)},
+    }
+
+
+def dry_run(plan, hours=24.0, seconds_per_video=120.0):
+    """
+    Simulate the schedule of the plan over `hours` on a virtual clock, with the pipeline finishing a video every
+    `seconds_per_video`. One video of every topic is generated against the fake clients to compare the requests
+    it actually sends with the estimated cost. Returns the report.
+    """
+    now = [0.0]
+
+    def clock():
+        return now[0]
+
+    def sleep(seconds):
+        now[0] += seconds
+
+    budgets = QuotaBudgets(plan.quotas, clock=clock)
+    scheduler = Scheduler(plan, budgets, clock=clock, sleep=sleep, horizon=hours * 3600)
+
+    timeline = []
+    while True:
+        job = scheduler.next_job("dry-run")
+        if job is None:
+            break
+        timeline.append((now[0], job[0]))
+        # The pipeline takes the next video once its slowest stage has room for it
+        sleep(seconds_per_video)
+
+    estimated = plan.video_cost
+    observed = {topic.topic: _sample_video_cost(topic.topic) for _, topic in plan.targets()}
+    return {
+        "timeline": timeline,
+        "videos": len(timeline),
+        "videos_per_hour": len(timeline) / hours,
+        "scheduled": {f"{channel}/{topic}": count for (channel, topic), count in scheduler.counts.items()},
+        "unmet": scheduler.unmet(),
+        "quota_remaining": budgets.usage(),
+        "estimated_cost": {api: estimated.get(api, {}) for api in ("gemini", "texttospeech")},
+        "observed_cost": observed,
+    }
+
+
+def _print_report(report):
+    print(f"{report['videos']} videos scheduled, {report['videos_per_hour']:.2f} per hour")
+    for start, job_id in report["timeline"]:
+        print(f"  {time.strftime('%H:%M:%S', time.gmtime(start))}  {job_id}")
+    print(f"Scheduled: {report['scheduled']}")
+    print(f"Unmet targets: {report['unmet'] or 'none'}")
+    print(f"Quota remaining: {report['quota_remaining']}")
+    print(f"Estimated cost per video: {report['estimated_cost']}")
+    for topic, cost in report["observed_cost"].items():
+        print(f"Observed on fake clients ({topic}, script and narration): {cost}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("plan", help="Plan JSON, see config/plan.example.json")
+    parser.add_argument("--run-id", help="Resume (or join) the run with this id")
+    parser.add_argument("--dry-run", action="store_true", help="Simulate the schedule against fake clients")
+    parser.add_argument("--hours", type=float, default=24.0, help="Simulated time of the dry run")
+    parser.add_argument("--seconds-per-video", type=float, default=120.0, help="Simulated pipeline throughput")
+    args = parser.parse_args()
+
+    if args.dry_run:
+        _print_report(dry_run(load_plan(args.plan), hours=args.hours, seconds_per_video=args.seconds_per_video))
+    else:
+        run(args.plan, run_id=args.run_id)
@@ -16,23 +16,33 @@ CATEGORY_TO_ID_MAPPING = {
 DESCRIPTIONS = {
     "Aviation": "What to know more about aviation? Follow us. #Shorts"
 }
+DEFAULT_CATEGORY_ID = "22"
+DEFAULT_DESCRIPTION = "Want to know more about {topic}? Follow us. #Shorts"
 
 
-def authenticate_youtube():
+def register_topic(topic, category_id=None, description=None):
+    """Add or override the YouTube category and description used for videos on the topic."""
+    if category_id is not None:
+        CATEGORY_TO_ID_MAPPING[topic] = category_id
+    if description is not None:
+        DESCRIPTIONS[topic] = description
+
+
+def authenticate_youtube(token_path=TOKEN_PATH, client_secrets_path=CLIENT_SECRETS_PATH):
     credentials = None
-    if os.path.exists(TOKEN_PATH):
-        with open(TOKEN_PATH, "r") as token_file:
+    if os.path.exists(token_path):
+        with open(token_path, "r") as token_file:
             credentials_data = json.load(token_file)
             credentials = Credentials.from_authorized_user_info(credentials_data, SCOPES)
 
     if not credentials or not credentials.refresh_token:
         flow = InstalledAppFlow.from_client_secrets_file(
-            CLIENT_SECRETS_PATH,
+            client_secrets_path,
             SCOPES
         )
         credentials = flow.run_local_server(port=0, access_type="offline", prompt="consent")
 
-        with open(TOKEN_PATH, "w") as token_file:
+        with open(token_path, "w") as token_file:
             token_file.write(credentials.to_json())
 
     if credentials.expired and credentials.refresh_token:
@@ -45,7 +55,7 @@ def upload_shorts(youtube, video_file, title, tags, topic, status="private", out
     if "#Shorts" not in title:
         title += " #Shorts"
 
-    description = DESCRIPTIONS[topic]
+    description = DESCRIPTIONS.get(topic, DEFAULT_DESCRIPTION.format(topic=topic))
 
     with open(output_dir, "w") as f:
         f.write(title)
@@ -57,7 +67,7 @@ def upload_shorts(youtube, video_file, title, tags, topic, status="private", out
                 "title": title,
                 "description": description,
                 "tags": tags,
-                "categoryId": CATEGORY_TO_ID_MAPPING.get(topic, "22"),
+                "categoryId": CATEGORY_TO_ID_MAPPING.get(topic, DEFAULT_CATEGORY_ID),
                 "defaultLanguage": "en",
             },
             "status": {
@@ -1,10 +1,13 @@
 import os
 import time
+import hashlib
 import logging
 import functools
+import threading
 from abc import ABC, abstractmethod
+from contextlib import nullcontext
 
-from google import genai
+from src.clients import get_client
 
 
 def retry_on_exception(attempts=3, delay=1, backoff=5, exception=Exception):
@@ -32,20 +35,109 @@ def retry_on_exception(attempts=3, delay=1, backoff=5, exception=Exception):
     return decorator
 
 
+def file_hash(path, chunk_size=1 << 20):
+    """SHA-256 of the file content."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class RateLimiter:
+    """
+    Token bucket rate limiter. Tokens refill continuously at `rate` per second,
+    up to `capacity` tokens, and `acquire` blocks until enough tokens are available.
+    `clock` can be replaced to drive the bucket with simulated time (see `try_acquire` and `wait_time`).
+    """
+
+    def __init__(self, rate, capacity=None, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.clock = clock
+        self._tokens = self.capacity
+        self._last_refill = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self.clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    def acquire(self, tokens=1):
+        if tokens > self.capacity:
+            raise ValueError(f"Cannot acquire {tokens} tokens from a bucket of capacity {self.capacity}")
+
+        while True:
+            wait_time = self.wait_time(tokens)
+            if wait_time == 0 and self.try_acquire(tokens):
+                return
+            time.sleep(wait_time)
+
+    def try_acquire(self, tokens=1):
+        """Take the tokens if they are available now, without blocking."""
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def wait_time(self, tokens=1):
+        """Seconds until `tokens` tokens are available."""
+        with self._lock:
+            self._refill()
+            return max(0.0, (tokens - self._tokens) / self.rate)
+
+    @property
+    def available(self):
+        with self._lock:
+            self._refill()
+            return self._tokens
+
+
 class BaseAgent(ABC):
-    def __init__(self):
-        self.client = genai.Client(api_key=os.environ["GEMINI_API_KEY"])
+    def __init__(self, client=None, response_store=None):
+        # Shared process-wide client unless one is injected
+        self.client = client or get_client("genai")
         self.model = 'gemini-2.0-flash-001'
+        # Optional src.response_store.ResponseStore, recording or replaying the responses of _inference
+        self.response_store = response_store
 
     @abstractmethod
     def generate(self, **kwargs):
         pass
 
+    def _inference(self, contents, config=None, key_contents=None):
+        """
+        Generate a response for the prompt contents. With a response store, the request is keyed by the model,
+        the contents and the config; `key_contents` replaces the contents in the key when they are not stable
+        across runs (e.g. uploaded files).
+        """
+        if self.response_store is None:
+            return self._generate_content(contents, config)
+
+        key = self.response_store.make_key(self.model, key_contents if key_contents is not None else contents, config)
+        response = self.response_store.lookup(key)
+        if response is None:
+            response = self._generate_content(contents, config)
+            self.response_store.record(key, response)
+        return response
+
+    def _recording(self):
+        """Record the responses of the block only if it completes, see ResponseStore.deferred."""
+        return self.response_store.deferred() if self.response_store is not None else nullcontext()
+
     @retry_on_exception(attempts=3)
-    def _inference(self, contents):
+    def _generate_content(self, contents, config=None):
+        return self._request_content(contents, config)
+
+    def _request_content(self, contents, config=None):
+        """A single generate_content request, without retries."""
         response = self.client.models.generate_content(
             model=self.model,
-            contents=contents
+            contents=contents,
+            config=config
         ).text
 
         return response
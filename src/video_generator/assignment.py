@@ -0,0 +1,58 @@
+import numpy as np
+
+
+def linear_sum_assignment(cost):
+    """
+    Hungarian algorithm (shortest augmenting paths with potentials) for a rows x columns cost matrix,
+    rows <= columns. Returns the column assigned to each row so that the total cost is minimal
+    and no column is used twice.
+    """
+    cost = np.asarray(cost, dtype=np.float64)
+    num_rows, num_cols = cost.shape
+    if num_rows > num_cols:
+        raise ValueError(f"Cannot assign {num_rows} rows to {num_cols} columns")
+
+    # Index 0 is a virtual column used as the root of every augmenting path.
+    u = np.zeros(num_rows + 1)
+    v = np.zeros(num_cols + 1)
+    col_to_row = np.zeros(num_cols + 1, dtype=int)
+    way = np.zeros(num_cols + 1, dtype=int)
+
+    for row in range(1, num_rows + 1):
+        col_to_row[0] = row
+        current_col = 0
+        min_reduced = np.full(num_cols + 1, np.inf)
+        used = np.zeros(num_cols + 1, dtype=bool)
+
+        while True:
+            used[current_col] = True
+            current_row = col_to_row[current_col]
+            free = ~used[1:]
+
+            reduced = cost[current_row - 1] - u[current_row] - v[1:]
+            improved = free & (reduced < min_reduced[1:])
+            min_reduced[1:][improved] = reduced[improved]
+            way[1:][improved] = current_col
+
+            candidates = np.where(free, min_reduced[1:], np.inf)
+            next_col = int(np.argmin(candidates)) + 1
+            delta = candidates[next_col - 1]
+
+            u[col_to_row[used]] += delta
+            v[used] -= delta
+            min_reduced[1:][free] -= delta
+
+            current_col = next_col
+            if col_to_row[current_col] == 0:
+                break
+
+        while current_col != 0:
+            previous_col = way[current_col]
+            col_to_row[current_col] = col_to_row[previous_col]
+            current_col = previous_col
+
+    assignment = np.full(num_rows, -1, dtype=int)
+    for col in range(1, num_cols + 1):
+        if col_to_row[col]:
+            assignment[col_to_row[col] - 1] = col - 1
+    return assignment
@@ -1,24 +1,193 @@
+import json
 import os
+import re
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from xml.sax.saxutils import escape
 
-from google.cloud import texttospeech
+import numpy as np
+from google.cloud import texttospeech_v1beta1 as texttospeech
 
+from src.cache import DiskCache
+from src.clients import get_client
 from src.utils import BaseAgent, logger
+from src.video_generator.narration_audio import NarrationAudio
+
+
+# Chirp HD voices ignore SSML marks, word timings need e.g. a Neural2 or Studio voice
+DEFAULT_VOICE = "en-US-Chirp-HD-F"
+TIMEPOINTS_VOICE = "en-US-Neural2-F"
+END_MARK = "end"
+SYNTHESIS_CACHE_PATH = "cache/synthesis.sqlite"
+# Layout of the synthesis cache entries, see _to_cache_entry
+CACHE_ENTRY_FORMAT = "pcm-v1"
+
+
+def split_sentences(text):
+    """Split a script at sentence boundaries (after ., ! or ? followed by whitespace)."""
+    return [sentence for sentence in re.split(r"(?<=[.!?])\s+", text.strip()) if sentence]
+
+
+def to_ssml_with_marks(text):
+    """Wrap the text in SSML with a mark before every word (named by its index) and one after the last word."""
+    words = text.split()
+    marked = " ".join(f'<mark name="{i}"/>{escape(word)}' for i, word in enumerate(words))
+    return words, f'<speak>{marked}<mark name="{END_MARK}"/></speak>'
+
+
+def word_timings_from_timepoints(words, timepoints):
+    """
+    Turn mark timepoints into {"word", "start", "end"} entries, the format AudioTranscriber produces.
+    A word lasts until the next word starts, words whose mark is missing are spread evenly between the neighbouring
+    marks. Returns None if the voice returned no timepoints.
+    """
+    times = {timepoint.mark_name: timepoint.time_seconds for timepoint in timepoints}
+    if not words or str(len(words) - 1) not in times:
+        return None
+
+    starts = [times.get(str(i)) for i in range(len(words))]
+    if starts[0] is None:
+        starts[0] = 0.0
+    previous = 0
+    for i in range(1, len(words)):
+        if starts[i] is None:
+            continue
+        for gap in range(previous + 1, i):
+            starts[gap] = starts[previous] + (starts[i] - starts[previous]) * (gap - previous) / (i - previous)
+        previous = i
+    ends = starts[1:] + [times.get(END_MARK, starts[-1])]
+    return [{"word": word, "start": start, "end": end} for word, start, end in zip(words, starts, ends)]
+
+
+def _to_cache_entry(narration):
+    """A JSON line with the sample rate, channels and word timings, followed by the raw PCM samples."""
+    header = {
+        "sample_rate": narration.sample_rate,
+        "channels": narration.channels,
+        "word_timings": narration.word_timings,
+    }
+    return json.dumps(header).encode() + b"\n" + narration.to_pcm_bytes()
+
+
+def _from_cache_entry(entry):
+    header, _, pcm = entry.partition(b"\n")
+    header = json.loads(header)
+    return NarrationAudio.from_pcm_bytes(pcm, header["sample_rate"], header["channels"], header["word_timings"])
 
 
 class AudioGenerationAgent(BaseAgent):
-    def __init__(self, output_dir="temp/output_audio.wav"):
-        super().__init__()
+    def __init__(
+        self,
+        output_dir="temp",
+        voice_name=DEFAULT_VOICE,
+        word_timings=False,
+        client=None,
+        max_workers=4,
+        sentence_gap=0.25,
+        cache=None,
+    ):
+        """
+        Scripts are split into sentences that are synthesized concurrently on `max_workers` threads and joined
+        with `sentence_gap` seconds of silence. With a DiskCache as `cache`, sentences already synthesized
+        with the same voice and audio config (recurring hooks and outros) are not requested again.
+
+        With `word_timings` the text is synthesized as SSML with a mark per word and the narration carries
+        the word timestamps, so it does not need to be transcribed. This requires a voice supporting SSML marks.
+        """
+        # The agent only talks to Text-to-Speech, its client is the shared TextToSpeechClient unless one is injected
+        super().__init__(client or get_client("texttospeech"))
         self.output_dir = output_dir
-        self.client = texttospeech.TextToSpeechClient()
+        self.word_timings = word_timings
+        self.max_workers = max_workers
+        self.sentence_gap = sentence_gap
+        self.cache = cache
         self.voice = texttospeech.VoiceSelectionParams(
             language_code="en-US",
-            name="en-US-Chirp-HD-F"
+            name=voice_name
         )
         self.audio_config = texttospeech.AudioConfig(
             audio_encoding=texttospeech.AudioEncoding.LINEAR16
         )
 
     def generate(self, text) -> str:
+        """Synthesize the text into a WAV file with a unique name in `output_dir` and return its path."""
+        narration = self.generate_narration(text)
+
+        if self.output_dir and not os.path.exists(self.output_dir):
+            os.makedirs(self.output_dir)
+
+        output_path = os.path.join(self.output_dir, f"narration_{uuid.uuid4().hex}.wav")
+        narration.save(output_path)
+        return output_path
+
+    def generate_narration(self, text) -> NarrationAudio:
+        """Synthesize the text straight into memory, without writing an audio file."""
+        sentences = split_sentences(text)
+        if not sentences:
+            raise ValueError("Nothing to synthesize")
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(sentences))) as executor:
+            parts = list(executor.map(self._synthesize_sentence, sentences))
+
+        narration = self._stitch(parts)
+        if self.word_timings and narration.word_timings is None:
+            logger.warning(f"Voice {self.voice.name} returned no timepoints, the narration will be transcribed")
+        logger.debug(f"Generated audio for a video from {len(sentences)} sentences")
+        return narration
+
+    def _synthesize_sentence(self, sentence) -> NarrationAudio:
+        key = DiskCache.make_key(
+            sentence,
+            self.voice.language_code,
+            self.voice.name,
+            texttospeech.AudioConfig.to_json(self.audio_config),
+            self.word_timings,
+            CACHE_ENTRY_FORMAT,
+        )
+        if self.cache is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return _from_cache_entry(cached)
+
+        if self.word_timings:
+            words, ssml = to_ssml_with_marks(sentence)
+            response = self._synthesize_with_timepoints(ssml)
+            word_timings = word_timings_from_timepoints(words, response.timepoints)
+        else:
+            response = self._synthesize(sentence)
+            word_timings = None
+
+        narration = NarrationAudio.from_wav_bytes(response.audio_content, word_timings)
+        if self.cache is not None:
+            self.cache.set(key, _to_cache_entry(narration))
+        return narration
+
+    def _stitch(self, parts) -> NarrationAudio:
+        """Join the sentences in order with `sentence_gap` seconds of silence, shifting their word timings."""
+        sample_rate, channels = parts[0].sample_rate, parts[0].channels
+        if any(part.sample_rate != sample_rate or part.channels != channels for part in parts):
+            raise ValueError("Sentences were synthesized with different sample rates or channel counts")
+
+        gap = np.zeros((int(round(self.sentence_gap * sample_rate)), channels), dtype=parts[0].samples.dtype)
+        has_timings = all(part.word_timings for part in parts)
+        samples, word_timings = [], []
+        offset = 0
+        for i, part in enumerate(parts):
+            if i > 0:
+                samples.append(gap)
+                offset += len(gap)
+            samples.append(part.samples)
+            if has_timings:
+                start = offset / sample_rate
+                word_timings.extend(
+                    {"word": word["word"], "start": word["start"] + start, "end": word["end"] + start}
+                    for word in part.word_timings
+                )
+            offset += len(part.samples)
+
+        return NarrationAudio(np.concatenate(samples), sample_rate, word_timings if has_timings else None)
+
+    def _synthesize(self, text):
         synthesis_input = texttospeech.SynthesisInput(text=text)
 
         response = self.client.synthesize_speech(
@@ -26,13 +195,13 @@ class AudioGenerationAgent(BaseAgent):
             voice=self.voice,
             audio_config=self.audio_config
         )
+        return response
 
-        out_directory = "/".join(self.output_dir.split("/")[:-1])
-        if not os.path.exists(out_directory) and out_directory != "":
-            os.makedirs(out_directory)
-
-        with open(self.output_dir, "wb") as out:
-            out.write(response.audio_content)
-
-        logger.debug("Generated audio for a video")
-        return self.output_dir
+    def _synthesize_with_timepoints(self, ssml):
+        request = texttospeech.SynthesizeSpeechRequest(
+            input=texttospeech.SynthesisInput(ssml=ssml),
+            voice=self.voice,
+            audio_config=self.audio_config,
+            enable_time_pointing=[texttospeech.SynthesizeSpeechRequest.TimepointType.SSML_MARK],
+        )
+        return self.client.synthesize_speech(request=request)
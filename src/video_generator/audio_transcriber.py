@@ -1,30 +1,28 @@
-import io
-from pydub import AudioSegment
+from concurrent.futures import ThreadPoolExecutor
+
 from google.cloud import speech_v1p1beta1 as speech
 
+from src.clients import get_client
+from src.video_generator.narration_audio import NarrationAudio
+
 
 class AudioTranscriber:
-    def __init__(self, chunk_length_ms=30000):  # 60 seconds chunks by default
+    def __init__(self, chunk_length_ms=30000, client=None, max_workers=4):  # 30 seconds chunks by default
         self.chunk_length_ms = chunk_length_ms
-        self.client = speech.SpeechClient()
-
-    def split_audio(self, audio_path):
-        # Load the audio file
-        audio = AudioSegment.from_file(audio_path)
-        # Split the audio into chunks based on chunk_length_ms
-        chunks = []
-        for start_ms in range(0, len(audio), self.chunk_length_ms):
-            chunk = audio[start_ms:start_ms + self.chunk_length_ms]
-            chunks.append(chunk)
-        return chunks
+        self.max_workers = max_workers
+        # Shared process-wide SpeechClient, or any object with its `recognize(config=..., audio=...)`
+        self.client = client or get_client("speech")
 
-    def transcribe_audio_chunk(self, chunk):
-        # Save chunk as a temporary file
-        temp_audio_path = "temp_audio.wav"
-        chunk.export(temp_audio_path, format="wav")
+    def split_audio(self, audio):
+        # Load the audio file, unless the narration is already in memory
+        if not isinstance(audio, NarrationAudio):
+            audio = NarrationAudio.from_file(audio)
+        # Split the audio into (start offset, chunk) pairs based on chunk_length_ms
+        return list(audio.chunks(self.chunk_length_ms / 1000))
 
-        with io.open(temp_audio_path, "rb") as audio_file:
-            content = audio_file.read()
+    def transcribe_audio_chunk(self, chunk):
+        # Encode the chunk as WAV in memory
+        content = chunk.to_wav_bytes()
 
         audio = speech.RecognitionAudio(content=content)
         config = speech.RecognitionConfig(
@@ -48,34 +46,30 @@ class AudioTranscriber:
 
         return subtitles
 
-    def combine_subtitles(self, subtitles_chunks):
+    def combine_subtitles(self, subtitles_chunks, offsets):
         all_subtitles = []
-        offset = 0  # Track time offset between chunks
 
-        for chunk_subtitles in subtitles_chunks:
+        # Word timestamps are relative to their chunk, shift them by the chunk's start time
+        for chunk_subtitles, offset in zip(subtitles_chunks, offsets):
             for subtitle in chunk_subtitles:
                 subtitle["start"] += offset
                 subtitle["end"] += offset
                 all_subtitles.append(subtitle)
 
-            # Update the offset for the next chunk
-            if chunk_subtitles:
-                last_chunk_end = chunk_subtitles[-1]["end"]
-                offset = last_chunk_end  # Set the new offset for the next chunk
-
         return all_subtitles
 
-    def transcribe_audio_with_timestamps(self, audio_path):
+    def transcribe_audio_with_timestamps(self, audio):
         # Step 1: Split the audio into smaller chunks
-        chunks = self.split_audio(audio_path)
+        chunks = self.split_audio(audio)
+        if not chunks:
+            return []
+        offsets = [offset for offset, _ in chunks]
 
-        # Step 2: Transcribe each chunk
-        subtitles_chunks = []
-        for chunk in chunks:
-            chunk_subtitles = self.transcribe_audio_chunk(chunk)
-            subtitles_chunks.append(chunk_subtitles)
+        # Step 2: Transcribe the chunks concurrently
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(chunks))) as executor:
+            subtitles_chunks = list(executor.map(self.transcribe_audio_chunk, [chunk for _, chunk in chunks]))
 
         # Step 3: Combine all the subtitles and synchronize the timestamps
-        final_subtitles = self.combine_subtitles(subtitles_chunks)
+        final_subtitles = self.combine_subtitles(subtitles_chunks, offsets)
 
         return final_subtitles
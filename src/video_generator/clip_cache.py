@@ -0,0 +1,132 @@
+import argparse
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from src.ffmpeg_utils import run_ffmpeg
+from src.utils import file_hash, logger
+
+
+class NormalizedClipCache:
+    """
+    Base clips transcoded once to the target resolution, fps and pixel format (scaled to fit and letterboxed),
+    keyed by (source content hash, resolution, fps). Intermediates are produced on first use or by `warm_up`,
+    and the least recently used ones are evicted when the cache grows beyond `max_bytes`. Clips used within the
+    last `eviction_grace` seconds are kept even then, as renders in this or another process may still read them.
+    """
+
+    def __init__(self, cache_dir="cache/normalized_clips", max_bytes=20 * 1024 ** 3, eviction_grace=3600):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.eviction_grace = eviction_grace
+        self.hits = 0
+        self.misses = 0
+        self._source_hashes = {}
+        self._lock = threading.Lock()
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+
+    def get(self, path, resolution, fps=24):
+        """Path of the normalized version of the clip, transcoding it first if it is not cached."""
+        width, height = resolution
+        cached_path = os.path.join(self.cache_dir, f"{self._source_hash(path)}_{width}x{height}_{fps}.mp4")
+
+        try:
+            # The mtime tracks the last use, for LRU eviction
+            os.utime(cached_path)
+        except FileNotFoundError:
+            # Not cached yet, or just evicted by another process
+            pass
+        else:
+            with self._lock:
+                self.hits += 1
+            return cached_path
+
+        with self._lock:
+            self.misses += 1
+        start_time = time.perf_counter()
+        temp_path = f"{cached_path}.{uuid.uuid4().hex}.tmp.mp4"
+        run_ffmpeg([
+            "-i", path,
+            "-vf", f"fps={fps},scale={width}:{height}:force_original_aspect_ratio=decrease,"
+                   f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2:black,setsar=1",
+            "-pix_fmt", "yuv420p",
+            "-c:v", "libx264",
+            "-an",
+            temp_path,
+        ])
+        os.replace(temp_path, cached_path)
+        logger.debug(f"Normalized {path} in {time.perf_counter() - start_time:.2f}s")
+
+        self._evict(keep=cached_path)
+        return cached_path
+
+    def warm_up(self, paths, resolution, fps=24, workers=4):
+        """Normalize all the given clips ahead of rendering."""
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(self.get, path, resolution, fps) for path in paths]
+        for path, future in zip(paths, futures):
+            try:
+                future.result()
+            except Exception as e:
+                logger.error(f"Normalizing {path} failed: {e}")
+        logger.info(f"Clip cache warmed up: {self.hits} already cached, {self.misses} normalized")
+
+    def _source_hash(self, path):
+        stat = os.stat(path)
+        key = (path, stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            source_hash = self._source_hashes.get(key)
+        if source_hash is None:
+            # Hashed outside the lock, two threads may hash the same file once each
+            source_hash = file_hash(path)
+            with self._lock:
+                self._source_hashes[key] = source_hash
+        return source_hash
+
+    def _evict(self, keep=None):
+        """Remove the least recently used clips over `max_bytes`, except `keep` and clips within the grace period."""
+        with self._lock:
+            entries = []
+            for filename in os.listdir(self.cache_dir):
+                if filename.endswith(".tmp.mp4"):
+                    continue
+                path = os.path.join(self.cache_dir, filename)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    # Evicted by another process meanwhile
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+            total = sum(size for _, size, _ in entries)
+            protected_since = time.time() - self.eviction_grace
+            for mtime, size, path in sorted(entries):
+                if total <= self.max_bytes or mtime >= protected_since:
+                    break
+                if path == keep:
+                    continue
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                logger.debug(f"Evicted {path} from the clip cache")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Normalize every base video listed in a descriptions CSV")
+    parser.add_argument("csv_path")
+    parser.add_argument("--resolution", type=int, nargs=2, default=(500, 800))
+    parser.add_argument("--fps", type=int, default=24)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--cache-dir", default="cache/normalized_clips")
+    parser.add_argument("--max-gb", type=float, default=20)
+    args = parser.parse_args()
+
+    cache = NormalizedClipCache(args.cache_dir, max_bytes=int(args.max_gb * 1024 ** 3))
+    cache.warm_up(pd.read_csv(args.csv_path)["video_path"].tolist(), tuple(args.resolution), args.fps, args.workers)
@@ -0,0 +1,113 @@
+import os
+import resource
+import threading
+from collections import OrderedDict
+
+from moviepy.editor import VideoClip, VideoFileClip
+
+
+def current_rss_bytes():
+    """Resident set size of this process (peak RSS where /proc is not available)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def open_file_count():
+    try:
+        return len(os.listdir("/proc/self/fd"))
+    except OSError:
+        return -1
+
+
+class ClipResourceManager:
+    """
+    Opens base clips (and with them their ffmpeg reader processes) only when their time window is rendered,
+    keeps at most `max_open` of them open and closes them as soon as the render has moved past them.
+    Tracks peak RSS and open file descriptors over the render.
+    """
+
+    def __init__(self, max_open=2):
+        self.max_open = max_open
+        self.opened = 0
+        self.peak_open = 0
+        self.peak_rss = 0
+        self.peak_open_files = 0
+        self._clips = OrderedDict()
+        self._lock = threading.Lock()
+
+    def acquire(self, index, path, prepare=None):
+        """Clip `index` of the timeline, opened from `path` and passed through `prepare` on first use."""
+        with self._lock:
+            if index in self._clips:
+                self._clips.move_to_end(index)
+                return self._clips[index][1]
+
+            source = VideoFileClip(path, audio=False)
+            clip = prepare(source) if prepare else source
+            self._clips[index] = (source, clip)
+            self.opened += 1
+            while len(self._clips) > self.max_open:
+                self._close(next(iter(self._clips)))
+
+            self.peak_open = max(self.peak_open, len(self._clips))
+            self.sample()
+            return clip
+
+    def release_before(self, index):
+        """Close every clip whose window ends before clip `index`."""
+        with self._lock:
+            for open_index in [open_index for open_index in self._clips if open_index < index]:
+                self._close(open_index)
+
+    def sample(self):
+        self.peak_rss = max(self.peak_rss, current_rss_bytes())
+        self.peak_open_files = max(self.peak_open_files, open_file_count())
+
+    def close_all(self):
+        with self._lock:
+            for index in list(self._clips):
+                self._close(index)
+
+    def report(self):
+        return {
+            "clips_opened": self.opened,
+            "peak_open_clips": self.peak_open,
+            "peak_rss_mb": round(self.peak_rss / 1024 ** 2, 1),
+            "peak_open_files": self.peak_open_files,
+        }
+
+    def _close(self, index):
+        source, clip = self._clips.pop(index)
+        clip.close()
+        source.close()
+
+
+class SequentialClip(VideoClip):
+    """
+    Base clips played one after another, `clip_duration` seconds each, whose readers are opened and closed
+    by the resource manager while the timeline is rendered instead of all being opened up front.
+    """
+
+    def __init__(self, paths, clip_duration, duration, resource_manager, prepare=None, frames_per_sample=24):
+        self.paths = paths
+        self.clip_duration = clip_duration
+        self.resource_manager = resource_manager
+        frames = [0]
+
+        def make_frame(t):
+            index = min(int(t // clip_duration), len(paths) - 1)
+            clip = resource_manager.acquire(index, paths[index], prepare)
+            resource_manager.release_before(index)
+
+            frames[0] += 1
+            if frames[0] % frames_per_sample == 0:
+                resource_manager.sample()
+            return clip.get_frame(t - index * clip_duration)
+
+        super().__init__(make_frame, duration=duration)
+
+    def close(self):
+        self.resource_manager.close_all()
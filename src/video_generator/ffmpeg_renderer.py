@@ -0,0 +1,133 @@
+import os
+import shutil
+import tempfile
+
+from PIL import ImageColor, ImageFont
+
+from src.ffmpeg_utils import run_ffmpeg
+
+
+ASS_TEMPLATE = """[Script Info]
+ScriptType: v4.00+
+PlayResX: {width}
+PlayResY: {height}
+WrapStyle: 0
+ScaledBorderAndShadow: yes
+
+[V4+ Styles]
+Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV, Encoding
+Style: Default,{font_name},{font_size},{text_color},{text_color},{bg_color},{bg_color},0,0,0,0,100,100,0,0,3,{padding},0,2,{padding},{padding},{margin},1
+
+[Events]
+Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
+"""
+
+
+def _ass_color(color):
+    r, g, b = ImageColor.getrgb(color)[:3]
+    return f"&H00{b:02X}{g:02X}{r:02X}"
+
+
+def _ass_time(seconds):
+    centiseconds = int(round(seconds * 100))
+    hours, centiseconds = divmod(centiseconds, 360000)
+    minutes, centiseconds = divmod(centiseconds, 6000)
+    return f"{hours}:{minutes:02d}:{centiseconds // 100:02d}.{centiseconds % 100:02d}"
+
+
+def write_ass_subtitles(path, entries, style, resolution, margin):
+    """
+    Write (text, start, end) entries as an ASS file drawing the text on an opaque box in the
+    subtitle style, bottom-centered `margin` pixels above the bottom of the frame.
+    """
+    font = ImageFont.truetype(style.font_path, style.font_size)
+    font_name = font.getname()[0]
+    # libass sizes fonts by line height (ascent + descent) rather than by em size like PIL
+    ascent, descent = font.getmetrics()
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(ASS_TEMPLATE.format(
+            width=resolution[0],
+            height=resolution[1],
+            font_name=font_name,
+            font_size=ascent + descent,
+            text_color=_ass_color(style.text_color),
+            bg_color=_ass_color(style.bg_color),
+            padding=style.padding,
+            margin=margin + style.padding,
+        ))
+        for text, start, end in entries:
+            text = text.replace("\\", "").replace("{", "(").replace("}", ")")
+            f.write(f"Dialogue: 0,{_ass_time(start)},{_ass_time(end)},Default,,0,0,0,,{text}\n")
+
+
+def build_filtergraph(num_clips, resolution, clip_duration, fps, subtitles_path=None, fonts_dir=None):
+    """
+    Per clip: fps conversion, scale to fit and letterbox to `resolution`, hold the last frame
+    if the clip is short and trim to `clip_duration`. Then concat and burn the subtitles in.
+    """
+    width, height = resolution
+    chains = []
+    for i in range(num_clips):
+        chains.append(
+            f"[{i}:v]fps={fps},"
+            f"scale={width}:{height}:force_original_aspect_ratio=decrease,"
+            f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2:black,setsar=1,"
+            f"tpad=stop_mode=clone:stop_duration={clip_duration},"
+            f"trim=duration={clip_duration},setpts=PTS-STARTPTS[v{i}]"
+        )
+
+    inputs = "".join(f"[v{i}]" for i in range(num_clips))
+    output = f"{inputs}concat=n={num_clips}:v=1:a=0"
+    if subtitles_path:
+        output += f",subtitles=filename={subtitles_path}:fontsdir={fonts_dir}"
+    output += ",format=yuv420p[out]"
+    chains.append(output)
+
+    return ";".join(chains)
+
+
+def render_with_ffmpeg(
+    video_paths,
+    narration,
+    subtitle_entries,
+    output_path,
+    style,
+    resolution,
+    clip_duration,
+    duration,
+    subtitle_margin,
+    fps=24,
+):
+    """
+    Render the video in a single ffmpeg process: trim, scale and pad every base clip, concatenate them,
+    burn in the subtitles from a generated ASS file and mux the narration, piped in as PCM.
+    No frames pass through Python.
+    """
+    # Everything the filtergraph references lives in a temp dir, so no paths need filtergraph escaping
+    work_dir = tempfile.mkdtemp(prefix="render_")
+    try:
+        subtitles_path = None
+        if subtitle_entries:
+            subtitles_path = os.path.join(work_dir, "subtitles.ass")
+            write_ass_subtitles(subtitles_path, subtitle_entries, style, resolution, subtitle_margin)
+            shutil.copy(style.font_path, os.path.join(work_dir, "font.ttf"))
+
+        args = []
+        for path in video_paths:
+            args += ["-i", path]
+        args += narration.ffmpeg_input_args()
+        args += [
+            "-filter_complex", build_filtergraph(
+                len(video_paths), resolution, clip_duration, fps, subtitles_path, work_dir
+            ),
+            "-map", "[out]",
+            "-map", f"{len(video_paths)}:a",
+            "-c:v", "libx264",
+            "-c:a", "aac",
+            "-r", fps,
+            "-t", f"{duration:.3f}",
+            output_path,
+        ]
+        run_ffmpeg(args, input=narration.to_pcm_bytes())
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
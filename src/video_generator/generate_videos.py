@@ -1,68 +1,285 @@
+import argparse
+import functools
 import os
 import shutil
+import threading
+import time
 from pathlib import Path
 
 import pandas as pd
 from dotenv import load_dotenv
-from moviepy.audio.io.AudioFileClip import AudioFileClip
 
+from src.cache import DiskCache
+from src.clients import registry as client_registry
+from src.job_store import DEFAULT_CHANNEL, JOB_STORE_PATH, JobStore, LeaseLost, make_worker_id
+from src.pipeline import Pipeline, Stage
+from src.response_store import RESPONSE_STORE_PATH, ResponseStore
 from src.utils import logger
 from src.video_generator.script_writer_agent import ScriptWriterAgent
 from src.video_generator.vector_store import VectorStore
 from src.video_generator.videos_finder_agent import VideoFinderAgent
-from src.video_generator.audio_generation_agent import AudioGenerationAgent
+from src.video_generator.audio_generation_agent import AudioGenerationAgent, SYNTHESIS_CACHE_PATH, TIMEPOINTS_VOICE
+from src.video_generator.narration_audio import NarrationAudio
 from src.video_generator.video_builder import VideoBuilder
 from src.uploaders.yt_upload import authenticate_youtube, upload_shorts
 
 ENV_PATH = "/Users/wnowogorski/PycharmProjects/TikTokGenerator/config/.env"
+OUTPUT_DIR = "generated_videos"
+STAGES = ("script", "narration", "clip_search", "render", "upload")
 
 
-def generate(topic, num_videos, time_per_base_video=7, drop_vs_if_exists=False):
+@functools.lru_cache(maxsize=None)
+def _job_store(path):
+    """One JobStore connection per process, shared by its stage threads."""
+    return JobStore(path)
+
+
+def _completed(job, stage):
+    return job["stage"] is not None and STAGES.index(job["stage"]) >= STAGES.index(stage)
+
+
+def _checkpoint(job, stage, **artifacts):
+    _job_store(job["job_store_path"]).checkpoint(job["id"], job["worker_id"], stage, **artifacts)
+    job["stage"] = stage
+    job["artifacts"].update(artifacts)
+
+
+def _load_narration(job):
+    artifacts = job["artifacts"]
+    return NarrationAudio.from_file(artifacts["audio_path"], artifacts["word_timings"])
+
+
+def _render_video(job):
+    """Render stage, runs in a worker process. Renders to a temporary file, so a crash leaves no partial video."""
+    if _completed(job, "render") and os.path.exists(job["artifacts"]["video_path"]):
+        return job
+
+    video_path = os.path.join(job["output_dir"], "video.mp4")
+    partial_path = os.path.join(job["output_dir"], "video.partial.mp4")
+    video_builder = VideoBuilder(
+        _load_narration(job),
+        job["artifacts"]["video_paths"],
+        output_path=partial_path,
+        time_per_base_video=job["params"]["time_per_base_video"]
+    )
+    video_builder.generate()
+    os.replace(partial_path, video_path)
+    _checkpoint(job, "render", video_path=video_path)
+    return job
+
+
+def generate(
+    topic,
+    num_videos,
+    time_per_base_video=7,
+    drop_vs_if_exists=False,
+    run_id=None,
+    **pipeline_options,
+):
+    """
+    Generate and upload `num_videos` videos on the topic to the default channel, see run_jobs.
+    Running again with the run_id of an interrupted run resumes it.
+    """
+    run_id = run_id or time.strftime("%Y%m%d-%H%M%S")
     env_path = Path(ENV_PATH)
     load_dotenv(dotenv_path=env_path)
 
     youtube = authenticate_youtube()
-
-    vector_store = VectorStore()
     # if drop_vs_if_exists and Path(":memory:").exists():
     #     logger.info(f"Removing existing vector store")
     #     shutil.rmtree(":memory:")
     # df = pd.read_csv(f"/Users/wnowogorski/PycharmProjects/TikTokGenerator/data/descriptions/{topic}.csv")
     # vector_store.store(df)
 
-    for video_num in range(num_videos):
-        try:
-            script_writer = ScriptWriterAgent()
-            script, title, tags = script_writer.generate(topic)
-
-            audio_generation = AudioGenerationAgent()
-            audio_path = audio_generation.generate(script)
-            audio_clip_duration = AudioFileClip(audio_path).duration
-
-            vf = VideoFinderAgent()
-            num_videos = int((audio_clip_duration // time_per_base_video) + 2)
-            video_paths = vf.generate(script, vector_store, num_videos)
-
-            video_output_path = f"generated_videos/video_{video_num}.mp4"
-            video_builder = VideoBuilder(
-                audio_path,
-                video_paths,
-                output_path=video_output_path,
-                time_per_base_video=time_per_base_video
+    jobs = [
+        (
+            f"{run_id}/{topic}/{video_num}",
+            {
+                "channel": DEFAULT_CHANNEL,
+                "topic": topic,
+                "video_num": video_num,
+                "time_per_base_video": time_per_base_video,
+            },
+        )
+        for video_num in range(num_videos)
+    ]
+    uploaders = {DEFAULT_CHANNEL: functools.partial(upload_shorts, youtube)}
+    return run_jobs(run_id, jobs, uploaders=uploaders, **pipeline_options)
+
+
+def run_jobs(
+    run_id,
+    jobs=(),
+    admit=None,
+    on_retry=None,
+    uploaders=None,
+    script_workers=4,
+    tts_workers=4,
+    clip_search_workers=2,
+    render_processes=2,
+    queue_size=2,
+    job_store_path=JOB_STORE_PATH,
+    max_attempts=3,
+):
+    """
+    Run video jobs, given as (job_id, params) pairs with the topic, channel, video_num and time_per_base_video.
+    `admit`, if given, is called for more jobs whenever the run has no pending one, until it returns None
+    (see src.scheduler), and `on_retry` with the params of every job claimed again after a failed attempt.
+    `uploaders` maps a channel to a function uploading (video path, title, tags, topic).
+
+    Videos move through a pipeline of stages (script, narration, clip search, render, upload) with bounded queues
+    in between, so that the LLM and TTS requests for the next videos overlap the render of the current ones.
+    Renders run in `render_processes` processes, uploads one at a time.
+
+    Every video is a job in the job store, with the artifacts of its completed stages (script, title and tags,
+    narration file and word timings, clip paths, rendered file, upload id). Running again with the run_id of an
+    interrupted run resumes every unfinished job from its last completed stage, and several processes started with
+    the same run_id drain its jobs together. The leases of jobs in flight are renewed while they wait between stages.
+    A failed job is released as soon as its stage fails and retried within the run, up to `max_attempts` times.
+
+    LLM responses are recorded per job as well; set RESPONSE_STORE_MODE=replay to run from recorded responses only,
+    or passthrough to disable the store.
+    """
+    vector_store = VectorStore()
+    response_store = ResponseStore(RESPONSE_STORE_PATH, mode=os.environ.get("RESPONSE_STORE_MODE", "record"))
+    synthesis_cache = DiskCache(SYNTHESIS_CACHE_PATH, max_entries=10_000, memory_entries=64)
+
+    job_store = _job_store(job_store_path)
+    worker_id = make_worker_id()
+    job_store.enqueue(run_id, jobs)
+    logger.info(f"Run {run_id}, worker {worker_id}, jobs: {job_store.summary(run_id)}, responses: {response_store.mode}")
+
+    # Agents share the process-wide API clients (src.clients), so building one per job is cheap; the narration agent
+    # has no per-job state and serves the whole batch. Word timings come with the synthesized audio, so the narration
+    # is not sent back for transcription
+    audio_generation = AudioGenerationAgent(voice_name=TIMEPOINTS_VOICE, word_timings=True, cache=synthesis_cache)
+
+    def write_script(job):
+        if not _completed(job, "script"):
+            script_writer = ScriptWriterAgent(response_store=response_store.namespaced(job["id"]), mode="structured")
+            script, title, tags = script_writer.generate(job["params"]["topic"])
+            _checkpoint(job, "script", script=script, title=title, tags=tags)
+        return job
+
+    def synthesize_narration(job):
+        if not _completed(job, "narration"):
+            narration = audio_generation.generate_narration(job["artifacts"]["script"])
+            audio_path = os.path.join(job["output_dir"], "narration.wav")
+            narration.save(audio_path)
+            _checkpoint(
+                job, "narration", audio_path=audio_path, word_timings=narration.word_timings, duration=narration.duration
             )
-            video_builder.generate()
+        return job
 
+    def find_clips(job):
+        if not _completed(job, "clip_search"):
+            vf = VideoFinderAgent(response_store=response_store.namespaced(job["id"]))
+            num_clips = int((job["artifacts"]["duration"] // job["params"]["time_per_base_video"]) + 2)
+            video_paths = vf.generate(job["artifacts"]["script"], vector_store, num_clips)
+            _checkpoint(job, "clip_search", video_paths=video_paths)
+        return job
+
+    def upload(job):
+        artifacts, params = job["artifacts"], job["params"]
+        if not _completed(job, "upload"):
             logger.info(
-                f"VIDEO GENERATION COMPLETE: {video_num} / {num_videos} \n"
-                f"Path: {video_output_path} \n"
-                f"Title: {title} \n"
-                f"Tags: {tags}\n"
+                f"VIDEO GENERATION COMPLETE: {job['id']} \n"
+                f"Path: {artifacts['video_path']} \n"
+                f"Title: {artifacts['title']} \n"
+                f"Tags: {artifacts['tags']}\n"
             )
+            channel = params.get("channel", DEFAULT_CHANNEL)
+            video_id = uploaders[channel](artifacts["video_path"], artifacts["title"], artifacts["tags"], params["topic"])
+            _checkpoint(job, "upload", video_id=video_id)
+            logger.info(f"Video is uploaded to {channel}: https://www.youtube.com/watch?v={video_id}")
+        job_store.complete(job["id"], worker_id)
+        release(job)
+        return job
+
+    in_flight = set()
+    in_flight_lock = threading.Lock()
+    # Notified whenever a job leaves the pipeline, a failed one may be pending again
+    job_released = threading.Condition(in_flight_lock)
+    releases = 0
+
+    def release(job):
+        nonlocal releases
+        with in_flight_lock:
+            in_flight.discard(job["id"])
+            releases += 1
+            job_released.notify_all()
+
+    def renew_leases(stop):
+        while not stop.wait(job_store.lease_seconds / 3):
+            with in_flight_lock:
+                job_ids = list(in_flight)
+            try:
+                job_store.renew(job_ids, worker_id)
+            except Exception as e:
+                logger.error(f"Renewing the leases of {len(job_ids)} jobs failed: {e}")
+
+    def record_failure(stage_name, job, error):
+        logger.error(f"An error occurred during the generation of {job['id']} ({stage_name}): {error}")
+        try:
+            job_store.fail(job["id"], worker_id, f"{stage_name}: {error}", max_attempts=max_attempts)
+        except LeaseLost:
+            logger.warning(f"Job {job['id']} was taken over by another worker")
+        release(job)
+
+    def claimed_jobs():
+        # Jobs are claimed only as the first stage has room for them, so parallel workers share the run fairly
+        while True:
+            with in_flight_lock:
+                releases_before_claim = releases
+            job = job_store.claim(worker_id, run_id)
+            if job is None:
+                admitted = admit() if admit is not None else None
+                if admitted is not None:
+                    job_store.enqueue(run_id, [admitted])
+                    continue
+                # Jobs in flight can still fail and be pending again, so the run is over only once they are done
+                with job_released:
+                    if releases == releases_before_claim:
+                        if not in_flight:
+                            return
+                        job_released.wait()
+                continue
+            output_dir = os.path.join(OUTPUT_DIR, *job["id"].split("/"))
+            os.makedirs(output_dir, exist_ok=True)
+            if job["stage"] is not None:
+                logger.info(f"Resuming job {job['id']} after stage {job['stage']}")
+            if job["attempts"] and on_retry is not None:
+                on_retry(job["params"])
+            with in_flight_lock:
+                in_flight.add(job["id"])
+            yield {**job, "worker_id": worker_id, "job_store_path": job_store_path, "output_dir": output_dir}
+
+    pipeline = Pipeline([
+        Stage("script", write_script, workers=script_workers),
+        Stage("narration", synthesize_narration, workers=tts_workers),
+        Stage("clip_search", find_clips, workers=clip_search_workers),
+        Stage("render", _render_video, workers=render_processes, processes=True),
+        Stage("upload", upload, workers=1),
+    ], queue_size=queue_size, on_failure=record_failure)
+
+    stop_renewing = threading.Event()
+    renewer = threading.Thread(target=renew_leases, args=(stop_renewing,), daemon=True)
+    renewer.start()
+    try:
+        result = pipeline.run(claimed_jobs())
+    finally:
+        stop_renewing.set()
+        renewer.join()
+
+    logger.info(f"Run {run_id} jobs: {job_store.summary(run_id)}, API clients: {client_registry.stats()}")
+    return result
 
-            video_id = upload_shorts(youtube, video_output_path, title, tags, topic)
-            logger.info(f"Video is uploaded: https://www.youtube.com/watch?v={video_id}")
 
-        except Exception as e:
-            logger.error("An error occurred during the generation: {}".format(e))
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--topic", default="Aviation")
+    parser.add_argument("--num-videos", type=int, default=30)
+    parser.add_argument("--run-id", help="Resume (or join) the run with this id")
+    args = parser.parse_args()
 
-generate("Aviation", 30, time_per_base_video=7)
\ No newline at end of file
+    generate(args.topic, args.num_videos, time_per_base_video=7, run_id=args.run_id)
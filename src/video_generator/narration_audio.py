@@ -0,0 +1,86 @@
+import io
+import wave
+
+import numpy as np
+from moviepy.audio.AudioClip import AudioArrayClip
+
+
+class NarrationAudio:
+    """
+    Narration decoded once into memory: int16 PCM samples (frames x channels) and their sample rate.
+    Duration, transcription chunks and the final mux are all derived from this buffer.
+    """
+
+    def __init__(self, samples: np.ndarray, sample_rate: int, word_timings=None):
+        if samples.ndim == 1:
+            samples = samples[:, np.newaxis]
+        self.samples = samples
+        self.sample_rate = sample_rate
+        self.word_timings = word_timings
+
+    @property
+    def duration(self) -> float:
+        return len(self.samples) / self.sample_rate
+
+    @property
+    def channels(self) -> int:
+        return self.samples.shape[1]
+
+    @classmethod
+    def from_wav_bytes(cls, data: bytes, word_timings=None) -> "NarrationAudio":
+        with wave.open(io.BytesIO(data)) as wav:
+            if wav.getsampwidth() != 2:
+                raise ValueError(f"Expected 16-bit PCM audio, got {8 * wav.getsampwidth()}-bit")
+            frames = wav.readframes(wav.getnframes())
+            samples = np.frombuffer(frames, dtype="<i2").reshape(-1, wav.getnchannels())
+            return cls(samples, wav.getframerate(), word_timings)
+
+    @classmethod
+    def from_pcm_bytes(cls, data: bytes, sample_rate: int, channels: int, word_timings=None) -> "NarrationAudio":
+        """Samples written by to_pcm_bytes."""
+        return cls(np.frombuffer(data, dtype="<i2").reshape(-1, channels), sample_rate, word_timings)
+
+    @classmethod
+    def from_file(cls, path, word_timings=None) -> "NarrationAudio":
+        with open(path, "rb") as f:
+            return cls.from_wav_bytes(f.read(), word_timings)
+
+    def slice(self, start: float, end: float = None) -> "NarrationAudio":
+        start_frame = int(round(start * self.sample_rate))
+        end_frame = len(self.samples) if end is None else int(round(end * self.sample_rate))
+        return NarrationAudio(self.samples[start_frame:end_frame], self.sample_rate)
+
+    def chunks(self, chunk_length: float):
+        """Yield (start offset in seconds, chunk) pairs of at most chunk_length seconds."""
+        chunk_frames = int(chunk_length * self.sample_rate)
+        for start_frame in range(0, len(self.samples), chunk_frames):
+            chunk = NarrationAudio(self.samples[start_frame:start_frame + chunk_frames], self.sample_rate)
+            yield start_frame / self.sample_rate, chunk
+
+    def to_wav_bytes(self) -> bytes:
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as wav:
+            wav.setnchannels(self.channels)
+            wav.setsampwidth(2)
+            wav.setframerate(self.sample_rate)
+            wav.writeframes(self.to_pcm_bytes())
+        return buffer.getvalue()
+
+    def to_pcm_bytes(self) -> bytes:
+        """Raw little-endian s16 samples, e.g. to pipe into ffmpeg (see ffmpeg_input_args)."""
+        return np.ascontiguousarray(self.samples, dtype="<i2").tobytes()
+
+    def ffmpeg_input_args(self):
+        """ffmpeg arguments reading the output of to_pcm_bytes from stdin."""
+        return ["-f", "s16le", "-ar", self.sample_rate, "-ac", self.channels, "-i", "pipe:0"]
+
+    def to_audio_clip(self) -> AudioArrayClip:
+        samples = self.samples.astype(np.float32) / 32768
+        # moviepy's audio writer expects stereo
+        if self.channels == 1:
+            samples = np.repeat(samples, 2, axis=1)
+        return AudioArrayClip(samples, fps=self.sample_rate)
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            f.write(self.to_wav_bytes())
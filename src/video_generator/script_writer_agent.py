@@ -1,6 +1,9 @@
 import ast
+import json
 from pathlib import Path
 
+from google.genai import types
+
 from src.utils import BaseAgent, logger
 
 
@@ -59,18 +62,103 @@ Format your output as a python list,
 """
 
 
+STRUCTURED_SCRIPT_PROMPT = """
+You are an experienced content creator,
+ you are working for a company which creates short (0.5-1.5 minute) videos for social platforms.
+
+Come up with five creative TikTok video ideas centered around {TOPIC}: questions which are interesting, not trivial,
+ and whose answer requires presenting some interesting information.
+Choose the one question whose answer will be the most interesting and engaging for viewers, and write a script answering it.
+
+Follow this guidelines for the script:
+- Start the script with a strong and relatable hook which captures attention.
+- Script should be written in a concise, conversational style suitable for TikTok.
+- Write script text only, DO NOT add timestamps, symbols (#, *, [, ]) or anything which might be improperly converted to audio.
+- Scrip should have 100-200 words.
+- End with a memorable closing statement or a preview of what's coming next.
+- Provide a complete, clear, interesting and easy-to-understand answer to the question.
+- Break down the explanation into manageable points or steps.
+
+Then generate a title (at most {MAX_TITLE_LENGTH} characters) and 10 one word tags for the video.
+Respond with the chosen question, the script, the title and the tags.
+"""
+
+
+REPAIR_SCRIPT_PROMPT = """
+You are preparing a TikTok video about {TOPIC}. These parts of the video are already done:
+{VALID_PARTS}
+
+These parts were rejected:
+{ERRORS}
+
+Write only the rejected parts ({FIELDS}), following the same guidelines:
+ the script answers the question in 100-200 words of plain text without symbols (#, *, [, ]),
+ the title has at most {MAX_TITLE_LENGTH} characters and there are 10 one word tags.
+"""
+
+
+SCRIPT_MODES = ("multi_step", "structured")
+SCRIPT_FIELDS = ("question", "script", "title", "tags")
+SCRIPT_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "question": {"type": "STRING"},
+        "script": {"type": "STRING"},
+        "title": {"type": "STRING"},
+        "tags": {"type": "ARRAY", "items": {"type": "STRING"}},
+    },
+    "required": list(SCRIPT_FIELDS),
+    "propertyOrdering": list(SCRIPT_FIELDS),
+}
+# The prompt asks for 100-200 words, validation leaves some slack before re-asking
+SCRIPT_MIN_WORDS = 80
+SCRIPT_MAX_WORDS = 250
+# Room for the " #Shorts" suffix within YouTube's 100 character limit
+MAX_TITLE_LENGTH = 92
+MIN_TAGS = 3
+MAX_TAGS = 10
+
+
+def _schema_for(fields):
+    return {
+        **SCRIPT_SCHEMA,
+        "properties": {field: SCRIPT_SCHEMA["properties"][field] for field in fields},
+        "required": list(fields),
+        "propertyOrdering": list(fields),
+    }
+
+
+def _structured_config(fields=SCRIPT_FIELDS):
+    return types.GenerateContentConfig(response_mime_type="application/json", response_schema=_schema_for(fields))
+
+
 class ScriptWriterAgent(BaseAgent):
+    def __init__(self, client=None, response_store=None, mode="multi_step", max_repairs=2):
+        """
+        `mode` is "multi_step" (ideas, evaluation, script, then title and tags: four sequential requests) or
+        "structured" (everything in one JSON response, re-asking up to `max_repairs` times for invalid parts only).
+        """
+        if mode not in SCRIPT_MODES:
+            raise ValueError(f"Unknown script mode: {mode}, expected one of {SCRIPT_MODES}")
+        super().__init__(client, response_store)
+        self.mode = mode
+        self.max_repairs = max_repairs
+
     def generate(self, topic):
+        # A script rejected by validation raises, so its responses are not recorded and a retry asks the model again
+        with self._recording():
+            if self.mode == "structured":
+                return self.generate_structured(topic)
+            return self.generate_multi_step(topic)
+
+    def generate_multi_step(self, topic):
         ideas = self.generate_ideas(topic)
         logger.info("Generated ideas for a video: {}".format(ideas))
 
         idea = self.evaluate_ideas(ideas)
         logger.info("Chosen idea for a video: {}".format(idea))
 
-        script = self.generate_script(idea)
-        characters_to_drop = ["*", "<", ">", '"', "'"]
-        for char in characters_to_drop:
-            script = script.replace(char, "")
+        script = self._clean_script(self.generate_script(idea))
         logger.info("Generated script for a video: {}".format(script))
 
         title, tags = self.generate_title_and_tags(script)
@@ -113,6 +201,105 @@ class ScriptWriterAgent(BaseAgent):
 
         return title, tags
 
+    def generate_structured(self, topic):
+        """
+        Generate question, script, title and tags in a single structured response. Parts failing validation
+        are repaired locally where possible, otherwise only they are asked for again.
+        """
+        response = self._inference(
+            [STRUCTURED_SCRIPT_PROMPT.format(TOPIC=topic, MAX_TITLE_LENGTH=MAX_TITLE_LENGTH)],
+            config=_structured_config()
+        )
+        result = self._repair(self._parse_json(response))
+
+        errors = self._validate(result)
+        for attempt in range(self.max_repairs):
+            if not errors:
+                break
+            logger.warning(f"Script parts rejected (attempt {attempt + 1}/{self.max_repairs}): {errors}")
+            result.update(self._repair(self._reask(topic, result, errors)))
+            errors = self._validate(result)
+        if errors:
+            raise ValueError(f"Could not generate a valid script: {errors}")
+
+        logger.info("Chosen idea for a video: {}".format(result["question"]))
+        logger.info("Generated script for a video: {}".format(result["script"]))
+        logger.info("Generated title and tags for a video: {}".format([result["title"]] + result["tags"]))
+
+        return result["script"], result["title"], result["tags"]
+
+    def _reask(self, topic, result, errors):
+        fields = [field for field in SCRIPT_FIELDS if field in errors]
+        valid_parts = {field: result[field] for field in SCRIPT_FIELDS if field not in errors}
+        prompt = REPAIR_SCRIPT_PROMPT.format(
+            TOPIC=topic,
+            VALID_PARTS=json.dumps(valid_parts, indent=1),
+            ERRORS="\n".join(f"- {field}: {error}" for field, error in errors.items()),
+            FIELDS=", ".join(fields),
+            MAX_TITLE_LENGTH=MAX_TITLE_LENGTH,
+        )
+        partial = self._parse_json(self._inference([prompt], config=_structured_config(fields)))
+        return {field: partial[field] for field in fields if field in partial}
+
+    @staticmethod
+    def _parse_json(response):
+        try:
+            parsed = json.loads(response)
+        except (TypeError, ValueError):
+            logger.warning("Structured script response is not valid JSON: {}".format(response))
+            return {}
+        return parsed if isinstance(parsed, dict) else {}
+
+    @classmethod
+    def _repair(cls, result):
+        """Fix what does not need the model: symbols in the script, "#" and spaces in tags, too many tags."""
+        result = dict(result)
+        if isinstance(result.get("script"), str):
+            result["script"] = " ".join(cls._clean_script(result["script"]).replace("#", "").split())
+        if isinstance(result.get("title"), str):
+            result["title"] = result["title"].strip()
+        if isinstance(result.get("tags"), list):
+            tags = []
+            for tag in result["tags"]:
+                tag = "".join(str(tag).lstrip("#").split())
+                if tag and tag not in tags:
+                    tags.append(tag)
+            result["tags"] = tags[:MAX_TAGS]
+        return result
+
+    @staticmethod
+    def _validate(result):
+        """Map every invalid part of a structured result to the reason it was rejected."""
+        errors = {}
+        question = result.get("question")
+        if not isinstance(question, str) or not question.strip():
+            errors["question"] = "missing"
+
+        script = result.get("script")
+        if not isinstance(script, str) or not script:
+            errors["script"] = "missing"
+        elif not SCRIPT_MIN_WORDS <= len(script.split()) <= SCRIPT_MAX_WORDS:
+            errors["script"] = f"has {len(script.split())} words, expected {SCRIPT_MIN_WORDS}-{SCRIPT_MAX_WORDS}"
+
+        title = result.get("title")
+        if not isinstance(title, str) or not title:
+            errors["title"] = "missing"
+        elif len(title) > MAX_TITLE_LENGTH:
+            errors["title"] = f"has {len(title)} characters, expected at most {MAX_TITLE_LENGTH}"
+
+        tags = result.get("tags")
+        if not isinstance(tags, list) or len(tags) < MIN_TAGS:
+            errors["tags"] = f"expected {MAX_TAGS} one word tags"
+
+        return errors
+
+    @staticmethod
+    def _clean_script(script):
+        characters_to_drop = ["*", "<", ">", '"', "'"]
+        for char in characters_to_drop:
+            script = script.replace(char, "")
+        return script
+
     @staticmethod
     def _extract_content(response):
         return response[response.find("[") + 1: response.find("]")]
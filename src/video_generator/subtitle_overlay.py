@@ -0,0 +1,74 @@
+from bisect import bisect_right
+
+import numpy as np
+
+
+class SubtitleOverlay:
+    """
+    Burns timed RGBA subtitle images into video frames as a single frame transform.
+    The subtitle active at a timestamp is found by binary search over the sorted start times,
+    and only the patch region of the frame is alpha-blended, in integer NumPy arithmetic.
+    """
+
+    def __init__(self, subtitles, frame_size):
+        """
+        subtitles: iterable of (start, end, rgba_image, (x, y)) with non-overlapping time ranges,
+        frame_size: (width, height) of the frames the overlay is applied to.
+        """
+        frame_w, frame_h = frame_size
+        self._starts = []
+        self._ends = []
+        self._patches = []
+
+        for start, end, image, (x, y) in sorted(subtitles, key=lambda subtitle: subtitle[0]):
+            # Clip the patch to the frame
+            x0, y0 = max(x, 0), max(y, 0)
+            x1, y1 = min(x + image.shape[1], frame_w), min(y + image.shape[0], frame_h)
+            if x0 >= x1 or y0 >= y1:
+                continue
+            image = image[y0 - y:y1 - y, x0 - x:x1 - x]
+
+            alpha = image[:, :, 3:4].astype(np.uint16)
+            self._starts.append(start)
+            self._ends.append(end)
+            self._patches.append((
+                (slice(y0, y1), slice(x0, x1)),
+                image[:, :, :3].astype(np.uint16) * alpha + 127,
+                255 - alpha,
+            ))
+
+    def active(self, t):
+        """Index of the subtitle shown at time t, or None."""
+        i = bisect_right(self._starts, t) - 1
+        if i >= 0 and t < self._ends[i]:
+            return i
+        return None
+
+    def apply(self, get_frame, t):
+        frame = get_frame(t)
+        i = self.active(t)
+        if i is None:
+            return frame
+
+        region, premultiplied, inverse_alpha = self._patches[i]
+        frame = np.array(frame, dtype=np.uint8)
+        frame[region] = (premultiplied + frame[region] * inverse_alpha) // 255
+        return frame
+
+    def __len__(self):
+        return len(self._patches)
+
+
+def build_subtitle_overlay(entries, subtitle_renderer, frame_size, subtitle_margin):
+    """
+    Overlay for (text, start, end) entries, rendered with the subtitle renderer and
+    positioned bottom-centered, `subtitle_margin` pixels above the bottom of the frame.
+    """
+    frame_w, frame_h = frame_size
+    subtitles = []
+    for text, start, end in entries:
+        image = subtitle_renderer.render(text)
+        position = ((frame_w - image.shape[1]) // 2, frame_h - image.shape[0] - subtitle_margin)
+        subtitles.append((start, end, image, position))
+
+    return SubtitleOverlay(subtitles, frame_size)
@@ -0,0 +1,112 @@
+import functools
+import threading
+from collections import OrderedDict
+from typing import NamedTuple
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+
+class SubtitleStyle(NamedTuple):
+    font_path: str
+    font_size: int
+    text_color: str
+    bg_color: str
+    max_width: int
+    max_height: int
+    padding: int = 15
+    radius: int = 15
+
+
+@functools.lru_cache(maxsize=None)
+def load_font(font_path, font_size):
+    return ImageFont.truetype(font_path, font_size)
+
+
+@functools.lru_cache(maxsize=8192)
+def measure(font_path, font_size, text):
+    """Bounding box of the rendered text."""
+    return load_font(font_path, font_size).getbbox(text)
+
+
+class SubtitleRenderer:
+    """
+    Renders subtitles as uint8 RGBA arrays: the text, wrapped to the available width, centered on a rounded
+    rectangle. Fonts are loaded once, text measurements are memoized and rendered images are kept in an LRU
+    keyed by (text, style), so repeated phrases are neither shaped nor rasterized again.
+    """
+
+    def __init__(self, style: SubtitleStyle, cache_size: int = 512):
+        self.style = style
+        self.cache_size = cache_size
+        self.hits = 0
+        self.misses = 0
+        self._images = OrderedDict()
+        self._lock = threading.Lock()
+
+    def render(self, text: str, style: SubtitleStyle = None) -> np.ndarray:
+        style = style or self.style
+        key = (text, style)
+        with self._lock:
+            if key in self._images:
+                self._images.move_to_end(key)
+                self.hits += 1
+                return self._images[key]
+            self.misses += 1
+
+        image = np.array(self._draw(text, style))
+        image.flags.writeable = False
+
+        with self._lock:
+            self._images[key] = image
+            while len(self._images) > self.cache_size:
+                self._images.popitem(last=False)
+        return image
+
+    def wrap(self, text: str, style: SubtitleStyle = None):
+        """Split the text into lines which fit the max width of the style."""
+        style = style or self.style
+        max_width = style.max_width - 2 * style.padding
+
+        lines = []
+        current_line = []
+        for word in text.split():
+            candidate = " ".join(current_line + [word])
+            line_width = self._bbox(candidate, style)[2] - self._bbox(" ".join(current_line), style)[0]
+            if line_width <= max_width:
+                current_line.append(word)
+            else:
+                lines.append(" ".join(current_line))
+                current_line = [word]
+
+        if current_line:
+            lines.append(" ".join(current_line))
+        return lines
+
+    def _draw(self, text: str, style: SubtitleStyle) -> Image:
+        lines = self.wrap(text, style)
+        boxes = [self._bbox(line, style) for line in lines]
+
+        text_w = max(box[2] - box[0] for box in boxes)
+        text_h = sum(box[3] - box[1] for box in boxes)
+
+        # Image size with padding, not exceeding the space available in the frame
+        img_w = text_w + 2 * style.padding
+        img_h = min(text_h + 2 * style.padding + 10, style.max_height)
+
+        img = Image.new("RGBA", (img_w, img_h), (0, 0, 0, 0))
+        draw = ImageDraw.Draw(img)
+        draw.rounded_rectangle((0, 0, img_w, img_h), radius=style.radius, fill=style.bg_color)
+
+        font = load_font(style.font_path, style.font_size)
+        y_offset = (img_h - text_h) / 2
+        for line, box in zip(lines, boxes):
+            text_x = (img_w - (box[2] - box[0])) / 2
+            draw.text((text_x, y_offset), line, font=font, fill=style.text_color)
+            y_offset += box[3] - box[1]
+
+        return img
+
+    @staticmethod
+    def _bbox(text, style):
+        return measure(style.font_path, style.font_size, text)
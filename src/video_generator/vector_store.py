@@ -1,51 +1,275 @@
+import json
+import os
 import time
+from abc import ABC, abstractmethod
+
 import chromadb
+import numpy as np
+
+from src.cache import DiskCache
+from src.utils import BaseAgent, RateLimiter, retry_on_exception, logger
+
+
+EMBEDDING_MODEL = "text-embedding-004"
+EMBEDDING_CACHE_PATH = "cache/embeddings.sqlite"
 
-from src.utils import BaseAgent, retry_on_exception, logger
+
+def default_embedding_agent():
+    return EmbeddingAgent(cache=DiskCache(EMBEDDING_CACHE_PATH, max_entries=500_000, memory_entries=10_000))
 
 
 class EmbeddingAgent(BaseAgent):
-    @retry_on_exception(attempts=3)
+    def __init__(self, client=None, cache=None):
+        super().__init__(client)
+        self.cache = cache
+
     def generate(self, text):
+        return self.generate_batch([text])[0]
+
+    def generate_batch(self, texts):
+        """
+        Embed a list of texts. Texts already present in the cache are served from it,
+        the remaining unique texts are embedded in a single request and cached.
+        """
+        texts = list(texts)
+        if self.cache is None:
+            return self._embed(texts)
+
+        keys = [DiskCache.make_key(EMBEDDING_MODEL, text) for text in texts]
+        embeddings = {}
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key in embeddings or key in missing:
+                continue
+            cached = self.cache.get(key)
+            if cached is None:
+                missing[key] = text
+            else:
+                embeddings[key] = np.frombuffer(cached, dtype=np.float32).tolist()
+
+        if missing:
+            for key, embedding in zip(missing, self._embed(list(missing.values()))):
+                self.cache.set(key, np.asarray(embedding, dtype=np.float32).tobytes())
+                embeddings[key] = list(embedding)
+
+        return [embeddings[key] for key in keys]
+
+    @retry_on_exception(attempts=3)
+    def _embed(self, texts):
         result = self.client.models.embed_content(
-            model="text-embedding-004",
-            contents=[text]
+            model=EMBEDDING_MODEL,
+            contents=texts
         )
-        return result.embeddings[0].values
+        return [embedding.values for embedding in result.embeddings]
 
 
-class VectorStore:
-    def __init__(self):
-        self.client = chromadb.PersistentClient(path=":memory:")
-        self.collection = self.client.get_or_create_collection(name="vector_store")
-        self.embedding_agent = EmbeddingAgent()
+class BaseVectorStore(ABC):
+    def __init__(self, embedding_agent=None):
+        self.embedding_agent = embedding_agent or default_embedding_agent()
+
+    def store(self, descriptions_df, batch_size=100, requests_per_second=1.0, write_batch_size=1000):
+        """
+        Embed descriptions in batches of `batch_size` (one embedding request per batch, paced by
+        a token bucket) and upsert them into the index every `write_batch_size` rows.
+        Returns the ingestion throughput in rows/sec.
+        """
+        descriptions_df = descriptions_df.dropna(subset=["description"])
+        rate_limiter = RateLimiter(requests_per_second)
+        pending_ids, pending_embeddings, pending_metadatas = [], [], []
+        start_time = time.perf_counter()
+
+        for batch_start in range(0, len(descriptions_df), batch_size):
+            logger.debug("Generating vector store: {} / {}".format(batch_start, len(descriptions_df)))
+            batch = descriptions_df.iloc[batch_start:batch_start + batch_size]
+
+            rate_limiter.acquire()
+            embeddings = self.embedding_agent.generate_batch(batch["description"].tolist())
 
-    def store(self, descriptions_df):
+            pending_ids.extend(str(index) for index in batch.index)
+            pending_embeddings.extend(embeddings)
+            pending_metadatas.extend(
+                {"text": text, "path": path} for text, path in zip(batch["description"], batch["video_path"])
+            )
 
-        for i, data in enumerate(descriptions_df.iterrows()):
-            if i % 30 == 0:
-                logger.debug("Generating vector store: {} / {}".format(i, len(descriptions_df)))
+            if len(pending_ids) >= write_batch_size:
+                self.upload_records(pending_ids, pending_embeddings, pending_metadatas)
+                pending_ids, pending_embeddings, pending_metadatas = [], [], []
 
-            index, row = data
-            time.sleep(1)
-            description = row["description"]
-            embedding = self.embedding_agent.generate(description)
-            self.upload_single_record(index, embedding, description, row["video_path"])
+        if pending_ids:
+            self.upload_records(pending_ids, pending_embeddings, pending_metadatas)
+
+        elapsed = time.perf_counter() - start_time
+        throughput = len(descriptions_df) / elapsed if elapsed > 0 else float("inf")
+        logger.info(f"Stored {len(descriptions_df)} records in {elapsed:.2f}s ({throughput:.1f} rows/sec)")
+        if self.embedding_agent.cache is not None:
+            logger.info(f"Embedding cache: {self.embedding_agent.cache.stats()}")
+        return throughput
+
+    def query(self, query, k=5):
+        """Retrieve top-k nearest neighbors along with their metadata."""
+        return self.query_batch([query], k=k)
+
+    def query_batch(self, queries, k=5):
+        """
+        Retrieve top-k nearest neighbors for every query with a single embedding request and index lookup.
+        Results have one row per query in "ids", "distances" and "metadatas".
+        """
+        query_embeddings = self.embedding_agent.generate_batch(queries)
+        return self.query_embeddings(query_embeddings, k=k)
 
     def upload_single_record(self, index, embedding, text, path):
         """Add an embedding with associated metadata."""
-        index = str(index)
-        self.collection.add(
-            ids=[index],
-            embeddings=[embedding],
-            metadatas=[{"text": text, "path": path}]
+        self.upload_records([str(index)], [embedding], [{"text": text, "path": path}])
+
+    @abstractmethod
+    def upload_records(self, ids, embeddings, metadatas):
+        """Upsert a batch of embeddings with associated metadata."""
+
+    @abstractmethod
+    def query_embeddings(self, query_embeddings, k=5):
+        """Retrieve top-k nearest neighbors for each of the given embeddings."""
+
+    @abstractmethod
+    def delete(self, ids):
+        """Remove the records with the given ids, unknown ids are ignored."""
+
+
+class VectorStore(BaseVectorStore):
+    def __init__(self, embedding_agent=None, path=":memory:"):
+        super().__init__(embedding_agent)
+        self.client = chromadb.PersistentClient(path=path)
+        self.collection = self.client.get_or_create_collection(name="vector_store")
+
+    def upload_records(self, ids, embeddings, metadatas):
+        self.collection.upsert(
+            ids=ids,
+            embeddings=embeddings,
+            metadatas=metadatas
         )
 
-    def query(self, query, k=5):
-        """Retrieve top-k nearest neighbors along with their metadata."""
-        query_embedding = self.embedding_agent.generate(query)
+    def query_embeddings(self, query_embeddings, k=5):
         results = self.collection.query(
-            query_embeddings=[query_embedding],
+            query_embeddings=query_embeddings,
             n_results=k
         )
         return results
+
+    def delete(self, ids):
+        if ids:
+            self.collection.delete(ids=[str(index) for index in ids])
+
+    def __len__(self):
+        return self.collection.count()
+
+
+class NumpyVectorStore(BaseVectorStore):
+    """
+    In-process index holding L2-normalized float32 embeddings in one contiguous array.
+    A batch of queries is answered with one matrix multiply and `argpartition`, distances are cosine distances.
+    If `path` is given, `save` writes the index there and it is reopened memory-mapped.
+    """
+
+    def __init__(self, embedding_agent=None, path=None):
+        super().__init__(embedding_agent)
+        self.path = path
+        self.ids = []
+        self.metadatas = []
+        self._positions = {}
+        self._embeddings = np.empty((0, 0), dtype=np.float32)
+
+        if path and os.path.exists(os.path.join(path, "embeddings.npy")):
+            self.load()
+
+    @property
+    def embeddings(self):
+        return self._embeddings[:len(self.ids)]
+
+    def upload_records(self, ids, embeddings, metadatas):
+        embeddings = self._normalize(np.asarray(embeddings, dtype=np.float32))
+        new_rows = sum(1 for index in dict.fromkeys(ids) if index not in self._positions)
+        self._reserve(len(self.ids) + new_rows, embeddings.shape[1])
+
+        for index, embedding, metadata in zip(ids, embeddings, metadatas):
+            position = self._positions.get(index)
+            if position is None:
+                position = len(self.ids)
+                self._positions[index] = position
+                self.ids.append(index)
+                self.metadatas.append(metadata)
+            else:
+                self.metadatas[position] = metadata
+            self._embeddings[position] = embedding
+
+    def query_embeddings(self, query_embeddings, k=5):
+        queries = self._normalize(np.asarray(query_embeddings, dtype=np.float32))
+        num_rows = len(self.ids)
+        k = min(k, num_rows)
+        if k == 0:
+            return {"ids": [[] for _ in queries], "distances": [[] for _ in queries], "metadatas": [[] for _ in queries]}
+
+        similarities = queries @ self.embeddings.T
+        if k < num_rows:
+            top = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+        else:
+            top = np.broadcast_to(np.arange(num_rows), similarities.shape)
+        top_similarities = np.take_along_axis(similarities, top, axis=1)
+        order = np.argsort(-top_similarities, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        distances = 1.0 - np.take_along_axis(top_similarities, order, axis=1)
+
+        return {
+            "ids": [[self.ids[i] for i in row] for row in top],
+            "distances": distances.tolist(),
+            "metadatas": [[self.metadatas[i] for i in row] for row in top],
+        }
+
+    def delete(self, ids):
+        removed = {self._positions[str(index)] for index in ids if str(index) in self._positions}
+        if not removed:
+            return
+
+        keep = [position for position in range(len(self.ids)) if position not in removed]
+        self._embeddings = np.ascontiguousarray(self.embeddings[keep])
+        self.ids = [self.ids[position] for position in keep]
+        self.metadatas = [self.metadatas[position] for position in keep]
+        self._positions = {index: position for position, index in enumerate(self.ids)}
+
+    def save(self):
+        """Write the index to `path`."""
+        if not os.path.exists(self.path):
+            os.makedirs(self.path)
+        np.save(os.path.join(self.path, "embeddings.npy"), np.ascontiguousarray(self.embeddings))
+        with open(os.path.join(self.path, "metadata.json"), "w") as f:
+            json.dump({"ids": self.ids, "metadatas": self.metadatas}, f)
+
+    def load(self):
+        """Open the index saved at `path`, with the embeddings memory-mapped read-only."""
+        self._embeddings = np.load(os.path.join(self.path, "embeddings.npy"), mmap_mode="r")
+        with open(os.path.join(self.path, "metadata.json")) as f:
+            metadata = json.load(f)
+        self.ids = metadata["ids"]
+        self.metadatas = metadata["metadatas"]
+        self._positions = {index: position for position, index in enumerate(self.ids)}
+
+    def _reserve(self, num_rows, dimension):
+        if self._embeddings.shape[1:] != (dimension,) and len(self.ids) > 0:
+            raise ValueError(f"Expected embeddings of dimension {self._embeddings.shape[1]}, got {dimension}")
+
+        writable = not isinstance(self._embeddings, np.memmap)
+        if writable and self._embeddings.shape[0] >= num_rows and self._embeddings.shape[1:] == (dimension,):
+            return
+
+        capacity = max(num_rows, 2 * self._embeddings.shape[0], 1024)
+        grown = np.zeros((capacity, dimension), dtype=np.float32)
+        if self.ids:
+            grown[:len(self.ids)] = self.embeddings
+        self._embeddings = grown
+
+    @staticmethod
+    def _normalize(embeddings):
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return embeddings / norms
+
+    def __len__(self):
+        return len(self.ids)
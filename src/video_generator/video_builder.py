@@ -1,24 +1,79 @@
+import math
 import os
-from typing import List, Tuple
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
 
 from moviepy.editor import (
+    VideoClip,
     VideoFileClip,
-    AudioFileClip,
-    CompositeVideoClip,
-    concatenate_videoclips,
-    ImageClip
 )
-from PIL import Image, ImageDraw, ImageFont
-import numpy as np
 
 from src.video_generator.audio_transcriber import AudioTranscriber
+from src.video_generator.ffmpeg_renderer import render_with_ffmpeg
+from src.video_generator.narration_audio import NarrationAudio
+from src.ffmpeg_utils import run_ffmpeg
+from src.video_generator.clip_resources import ClipResourceManager, SequentialClip
+from src.video_generator.subtitle_overlay import SubtitleOverlay, build_subtitle_overlay
+from src.video_generator.subtitle_renderer import SubtitleRenderer, SubtitleStyle
 from src.utils import logger
 
 
+RENDER_BACKENDS = ("moviepy", "ffmpeg")
+
+
+def fit_to_resolution(clip: VideoFileClip, resolution) -> VideoFileClip:
+    """
+    Resize the clip to fit the resolution while preserving aspect ratio.
+    Adds black letterboxing as needed.
+    """
+    target_w, target_h = resolution
+    clip_w, clip_h = clip.size
+    scale = min(target_w / clip_w, target_h / clip_h)
+    clip_resized = clip.resize(scale)
+    clip_with_bg = clip_resized.on_color(
+        size=resolution,
+        color=(0, 0, 0),
+        pos="center"
+    )
+    return clip_with_bg
+
+
+def _render_segment(job):
+    """
+    Render one time segment of the video (a run of consecutive base clips with their subtitles,
+    without audio) in a worker process.
+    """
+    resource_manager = ClipResourceManager()
+    prepare = None if job["normalized"] else (lambda clip: fit_to_resolution(clip, job["resolution"]))
+
+    # Exactly round(duration * fps) frames, so segments join without drift
+    num_frames = round((job["end"] - job["start"]) * job["fps"])
+    segment = SequentialClip(
+        job["video_paths"], job["clip_duration"], (num_frames - 0.5) / job["fps"], resource_manager, prepare=prepare
+    )
+
+    start, end = job["start"], job["end"]
+    entries = [
+        (text, max(entry_start, start) - start, min(entry_end, end) - start)
+        for text, entry_start, entry_end in job["subtitle_entries"]
+        if entry_start < end and entry_end > start
+    ]
+    overlay = build_subtitle_overlay(
+        entries, SubtitleRenderer(job["style"]), job["resolution"], job["subtitle_margin"]
+    )
+    segment.fl(overlay.apply).write_videofile(
+        job["output_path"], fps=job["fps"], codec="libx264", audio=False, logger=None
+    )
+
+    segment.close()
+    return job["output_path"]
+
+
 class VideoBuilder:
     def __init__(
         self,
-        audio_path,
+        audio,
         video_paths,
         target_resolution=(500, 800),
         font_path = "/Users/wnowogorski/PycharmProjects/TikTokGenerator/assets/fonts/Roboto-VariableFont_wdth,wght.ttf",
@@ -29,10 +84,21 @@ class VideoBuilder:
         max_words: int = 5,
         time_per_base_video: int = 8,
         output_path="generated_videos/full_video.mp4",
+        subtitle_renderer=None,
+        audio_transcriber=None,
+        render_backend: str = "moviepy",
+        clip_cache=None,
+        fps: int = 24,
+        render_workers: int = 1,
+        max_open_clips: int = 2,
     ):
-        self.audio_path = audio_path
-        self.audio_clip = AudioFileClip(audio_path)
-        self.duration = self.audio_clip.duration
+        if render_backend not in RENDER_BACKENDS:
+            raise ValueError(f"Unknown render backend: {render_backend}, expected one of {RENDER_BACKENDS}")
+
+        # The narration is decoded once, here or (preferably) straight from the TTS response
+        self.narration = audio if isinstance(audio, NarrationAudio) else NarrationAudio.from_file(audio)
+        self.audio_clip = self.narration.to_audio_clip()
+        self.duration = self.narration.duration
         self.video_paths = video_paths
         self.target_resolution = target_resolution
         self.font_path = font_path
@@ -42,6 +108,11 @@ class VideoBuilder:
         self.bg_color = bg_color
         self.max_words = max_words
         self.time_per_base_video = time_per_base_video
+        self.render_backend = render_backend
+        self.clip_cache = clip_cache
+        self.fps = fps
+        self.render_workers = render_workers
+        self.max_open_clips = max_open_clips
 
         self.output_path = output_path
         out_directory = os.path.dirname(output_path)
@@ -49,11 +120,24 @@ class VideoBuilder:
             os.makedirs(out_directory)
 
         self.subtitles = None
-        self.audio_transcriber = AudioTranscriber()
+        # Only needed when the narration has no word timings from synthesis, created on first use
+        self.audio_transcriber = audio_transcriber
+        self.subtitle_renderer = subtitle_renderer or SubtitleRenderer(self.subtitle_style())
 
     def generate(self):
-        logger.debug("Video Builder - Transcribing audio ... ")
-        self.subtitles = self.audio_transcriber.transcribe_audio_with_timestamps(self.audio_path)
+        self.subtitles = self.word_timings()
+
+        if self.render_backend == "ffmpeg":
+            logger.debug("Video Builder - Rendering video with ffmpeg ...")
+            self._render_with_ffmpeg()
+            self.audio_clip.close()
+            return
+
+        if self.render_workers > 1:
+            logger.debug(f"Video Builder - Rendering video in {self.render_workers} processes ...")
+            self._render_in_parallel()
+            self.audio_clip.close()
+            return
 
         logger.debug("Video Builder - Creating video ... ")
         base_video = self._create_video_from_videos()
@@ -61,137 +145,133 @@ class VideoBuilder:
         logger.debug("")
 
         logger.debug("Video Builder - Adding subtitles ... ")
-        subtitle_clips = self.create_subtitle_clips_from_transcription(self.subtitles)
+        subtitle_overlay = self.create_subtitle_overlay_from_transcription(self.subtitles, self.max_words)
 
         logger.debug("Video Builder - Saving video ...")
-        final_video = CompositeVideoClip([base_video, *subtitle_clips], size=base_video.size)
-        final_video.write_videofile(self.output_path, fps=24, codec="libx264", audio_codec="aac")
+        final_video = base_video.fl(subtitle_overlay.apply)
+        final_video.write_videofile(self.output_path, fps=self.fps, codec="libx264", audio_codec="aac")
         base_video.close()
         self.audio_clip.close()
+        logger.info(f"Video Builder - Render resources: {self.resource_manager.report()}")
+
+    def _render_with_ffmpeg(self):
+        render_with_ffmpeg(
+            self._source_paths(),
+            self.narration,
+            list(self._group_words(self.subtitles, self.max_words)),
+            self.output_path,
+            style=self.subtitle_renderer.style,
+            resolution=self.target_resolution,
+            clip_duration=self.time_per_base_video,
+            duration=self.duration,
+            subtitle_margin=self.subtitle_margin,
+            fps=self.fps,
+        )
+
+    def _render_in_parallel(self):
+        """
+        Split the timeline at base clip boundaries into `render_workers` segments, render them in separate
+        processes and join them with a stream copy concat. The narration is muxed once over the joined video,
+        so there are no audio seams at segment boundaries.
+        """
+        video_paths = self._source_paths()
+        num_clips = min(len(video_paths), math.ceil(self.duration / self.time_per_base_video))
+        num_segments = min(self.render_workers, num_clips)
+        subtitle_entries = list(self._group_words(self.subtitles, self.max_words))
+
+        work_dir = tempfile.mkdtemp(prefix="segments_", dir=os.path.dirname(self.output_path) or ".")
+        try:
+            jobs = []
+            for i in range(num_segments):
+                first_clip = i * num_clips // num_segments
+                last_clip = (i + 1) * num_clips // num_segments
+                jobs.append({
+                    "video_paths": video_paths[first_clip:last_clip],
+                    "start": first_clip * self.time_per_base_video,
+                    "end": min(last_clip * self.time_per_base_video, self.duration),
+                    "clip_duration": self.time_per_base_video,
+                    "normalized": self.clip_cache is not None,
+                    "resolution": self.target_resolution,
+                    "fps": self.fps,
+                    "style": self.subtitle_renderer.style,
+                    "subtitle_margin": self.subtitle_margin,
+                    "subtitle_entries": subtitle_entries,
+                    "output_path": os.path.abspath(os.path.join(work_dir, f"segment_{i}.mp4")),
+                })
+
+            with ProcessPoolExecutor(max_workers=num_segments) as executor:
+                segment_paths = list(executor.map(_render_segment, jobs))
+
+            concat_list = os.path.join(work_dir, "segments.txt")
+            with open(concat_list, "w") as f:
+                f.writelines(f"file '{path}'\n" for path in segment_paths)
+
+            run_ffmpeg([
+                "-f", "concat", "-safe", 0, "-i", concat_list,
+                *self.narration.ffmpeg_input_args(),
+                "-map", "0:v", "-map", "1:a",
+                "-c:v", "copy", "-c:a", "aac",
+                "-t", f"{self.duration:.3f}",
+                self.output_path,
+            ], input=self.narration.to_pcm_bytes())
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    def word_timings(self):
+        """Word timestamps from the narration's synthesis if it has them, otherwise from transcribing it."""
+        if self.narration.word_timings:
+            logger.debug("Video Builder - Using word timings from the narration")
+            return [dict(word) for word in self.narration.word_timings]
+
+        logger.debug("Video Builder - Transcribing audio ... ")
+        if self.audio_transcriber is None:
+            self.audio_transcriber = AudioTranscriber()
+        return self.audio_transcriber.transcribe_audio_with_timestamps(self.narration)
+
+    def _source_paths(self):
+        """Base video paths, replaced by their normalized versions when a clip cache is used."""
+        if self.clip_cache is None:
+            return self.video_paths
+        return [self.clip_cache.get(path, self.target_resolution, self.fps) for path in self.video_paths]
 
     def _resize_clip(self, clip: VideoFileClip) -> VideoFileClip:
         """
         Resize the clip to fit the target resolution while preserving aspect ratio.
         Adds black letterboxing as needed.
         """
-        target_w, target_h = self.target_resolution
-        clip_w, clip_h = clip.size
-        scale = min(target_w / clip_w, target_h / clip_h)
-        clip_resized = clip.resize(scale)
-        clip_with_bg = clip_resized.on_color(
-            size=self.target_resolution,
-            color=(0, 0, 0),
-            pos="center"
-        )
-        return clip_with_bg
+        return fit_to_resolution(clip, self.target_resolution)
 
-    def _create_video_from_videos(self) -> VideoFileClip:
+    def _create_video_from_videos(self) -> VideoClip:
         """
-        Load each video, resize them, and concatenate into one clip.
+        Play the videos one after another, each resized and lasting time_per_base_video.
+        A video is only opened while its time window is rendered, see ClipResourceManager.
         """
-        clips = []
-        for path in self.video_paths:
-            clip = VideoFileClip(path)
-            clip = self._resize_clip(clip)
-            clip = clip.set_duration(self.time_per_base_video)
-            clips.append(clip)
-        final_clip = concatenate_videoclips(clips, method="compose")
-        final_clip = final_clip.set_duration(self.duration)
+        self.resource_manager = ClipResourceManager(max_open=self.max_open_clips)
+        prepare = None if self.clip_cache is not None else self._resize_clip
+        final_clip = SequentialClip(
+            self._source_paths(),
+            self.time_per_base_video,
+            self.duration,
+            self.resource_manager,
+            prepare=prepare,
+        )
         return final_clip
 
-    def _create_subtitle_clips(self) -> List[ImageClip]:
-        """
-        Split the provided script into segments (each with max_words words).
-        Create an ImageClip for each segment, each lasting for a fraction
-        of the audio's duration. The clips are positioned near the bottom.
-        """
-        # Split the script into words and then group them
-        words = self.script.split()
-        subtitle_segments = [
-            " ".join(words[i : i + self.max_words])
-            for i in range(0, len(words), self.max_words)
-        ]
-        num_segments = len(subtitle_segments)
-        # Calculate duration per subtitle segment
-        seg_duration = self.duration / num_segments if num_segments > 0 else self.duration
-
-        subtitle_clips = []
-        for idx, text in enumerate(subtitle_segments):
-            # Create an image with the subtitle text on a red rounded rectangle
-            subtitle_img = self._create_subtitle_image(text)
-            # Create an ImageClip from the numpy array
-            clip = ImageClip(np.array(subtitle_img), transparent=True)
-            clip = clip.set_duration(seg_duration)
-            clip = clip.set_start(idx * seg_duration)
-            # Position at bottom center with a margin upward
-            clip = clip.set_position(("center", self.target_resolution[1] - clip.h - self.subtitle_margin))
-            subtitle_clips.append(clip)
-        return subtitle_clips
-
-    def _create_subtitle_image(self, text: str, padding: int = 15, radius: int = 15) -> Image:
-        """
-        Create a PIL image with the subtitle text rendered on top of a
-        rounded rectangle with a red background. The text is centered.
-        If the text exceeds the width, it will be split into multiple lines.
-        """
-        font = ImageFont.truetype(self.font_path, self.font_size)
-        max_width = self.target_resolution[0] - 2 * padding  # Max width available for the subtitle
-
-        # Split the text into lines based on the max width
-        words = text.split()
-        lines = []
-        current_line = []
-
-        # Loop over each word and check if adding it would exceed the max width
-        for word in words:
-            line_width = font.getbbox(" ".join(current_line + [word]))[2] - font.getbbox(" ".join(current_line))[0]
-            if line_width <= max_width:
-                current_line.append(word)
-            else:
-                # When the line exceeds the max width, push the current line to the lines list
-                lines.append(" ".join(current_line))
-                current_line = [word]  # Start a new line with the current word
-
-        # Add the last line if any
-        if current_line:
-            lines.append(" ".join(current_line))
-
-        # Calculate the final text width and height
-        text_w = max([font.getbbox(line)[2] - font.getbbox(line)[0] for line in lines])
-        text_h = sum([font.getbbox(line)[3] - font.getbbox(line)[1] for line in lines])
-
-        # Define image size with padding and enough height to fit multiple lines
-        img_w = text_w + 2 * padding
-        img_h = text_h + 2 * padding + 10
-
-        # Ensure the background height doesn't exceed the video frame
-        img_h = min(img_h, self.target_resolution[1] - 2 * self.subtitle_margin)
-
-        # Create an image with transparent background (RGBA)
-        img = Image.new("RGBA", (img_w, img_h), (0, 0, 0, 0))
-        draw = ImageDraw.Draw(img)
-
-        # Draw a rounded rectangle (background)
-        rect_coords = (0, 0, img_w, img_h)
-        draw.rounded_rectangle(
-            rect_coords,
+    def subtitle_style(self, padding: int = 15, radius: int = 15) -> SubtitleStyle:
+        return SubtitleStyle(
+            font_path=self.font_path,
+            font_size=self.font_size,
+            text_color=self.text_color,
+            bg_color=self.bg_color,
+            max_width=self.target_resolution[0],
+            max_height=self.target_resolution[1] - 2 * self.subtitle_margin,
+            padding=padding,
             radius=radius,
-            fill=self.bg_color
         )
 
-        # Draw the text centered
-        y_offset = (img_h - text_h) / 2  # Start from the top part of the background
-        for line in lines:
-            line_w = font.getbbox(line)[2] - font.getbbox(line)[0]
-            text_x = (img_w - line_w) / 2  # Center the text horizontally
-            draw.text((text_x, y_offset), line, font=font, fill=self.text_color)
-            y_offset += font.getbbox(line)[3] - font.getbbox(line)[1]  # Move down for the next line
-
-        return img
-
-
-    def create_subtitle_clips_from_transcription(self, subtitles, max_words_per_subtitle=5):
-        subtitle_clips = []
+    @staticmethod
+    def _group_words(subtitles, max_words_per_subtitle=5):
+        """Yield (text, start, end) for consecutive groups of max_words_per_subtitle words."""
         num_segments = len(subtitles) // max_words_per_subtitle
         for i in range(num_segments):
             # Get the words for this subtitle segment
@@ -199,19 +279,13 @@ class VideoBuilder:
             text = " ".join([word["word"] for word in segment])
 
             # Use the first word's start time and the last word's end time for the timing
-            start_time = segment[0]["start"]
-            end_time = segment[-1]["end"]
-
-            # Create the subtitle image as you already do
-            subtitle_img = self._create_subtitle_image(text)
-            clip = ImageClip(np.array(subtitle_img), transparent=True)
-            clip = clip.set_start(start_time).set_end(end_time)
-
-            # Position the subtitle at the bottom of the screen
-            clip = clip.set_position(("center", self.target_resolution[1] - clip.h - self.subtitle_margin))
-            subtitle_clips.append(clip)
-
-        return subtitle_clips
-
-
-
+            yield text, segment[0]["start"], segment[-1]["end"]
+
+    def create_subtitle_overlay_from_transcription(self, subtitles, max_words_per_subtitle=5) -> SubtitleOverlay:
+        """Subtitles of the grouped words as one frame transform drawn over the base video."""
+        return build_subtitle_overlay(
+            self._group_words(subtitles, max_words_per_subtitle),
+            self.subtitle_renderer,
+            self.target_resolution,
+            self.subtitle_margin,
+        )
@@ -1,6 +1,9 @@
 import ast
 
+import numpy as np
+
 from src.utils import BaseAgent, logger
+from src.video_generator.assignment import linear_sum_assignment
 
 
 SCRIPT = """
@@ -29,29 +32,66 @@ Here is script: {SCRIPT}
 
 
 class VideoFinderAgent(BaseAgent):
-    def generate(self, script, vector_store, num_videos):
+    def generate(self, script, vector_store, num_videos, candidates_per_idea=None):
         logger.debug(f"Looking for {num_videos} videos ...")
-        prompt_content = [DESCRIBE_SUITABLE_VIDEO_PROMPT.format(NUM_VIDEOS=num_videos, SCRIPT=script)]
-        response = self._inference(prompt_content)
-
-        descriptions = self._extract_content(response)
-
-        paths = []
-        for i, descs in enumerate(descriptions):
-            min_distance = 1000
-            best_match = None
-            for desc in descs:
-                vs_res = vector_store.query(desc, k=1)
-                distance = vs_res["distances"][0][0]
-                match = vs_res["metadatas"][0][0]
-                if distance < min_distance and match not in paths:
-                    min_distance = distance
-                    best_match = match
-
-            logger.debug(f"Searching for a most suitable video: {i} / {num_videos}, Best match: {best_match}")
-            paths.append(best_match)
-
-        return [v["path"] for v in paths]
+        if len(vector_store) == 0:
+            raise ValueError("The vector store is empty, there are no clips to choose from")
+
+        # Responses which can't be parsed raise, they are not recorded and a retry asks the model again
+        with self._recording():
+            prompt_content = [DESCRIBE_SUITABLE_VIDEO_PROMPT.format(NUM_VIDEOS=num_videos, SCRIPT=script)]
+            response = self._inference(prompt_content)
+
+            descriptions = self._extract_content(response)
+
+            # Enough candidates per idea that every segment can get a distinct clip
+            k = min(candidates_per_idea or len(descriptions), len(vector_store))
+            flat_descriptions = [desc for descs in descriptions for desc in descs]
+            vs_res = vector_store.query_batch(flat_descriptions, k=k)
+
+            paths = self._assign_clips(descriptions, vs_res)
+            for i, path in enumerate(paths):
+                logger.debug(f"Searching for a most suitable video: {i} / {num_videos}, Best match: {path}")
+
+            return paths
+
+    @staticmethod
+    def _assign_clips(descriptions, vs_res):
+        """
+        Build a segments x clips cost matrix (the best distance of any of the segment's ideas to the clip)
+        and solve the assignment globally, so that every segment gets a distinct clip.
+        """
+        clip_paths = []
+        clip_columns = {}
+        best_distances = {}
+        query_index = 0
+        for segment, descs in enumerate(descriptions):
+            for _ in descs:
+                for distance, metadata in zip(vs_res["distances"][query_index], vs_res["metadatas"][query_index]):
+                    column = clip_columns.setdefault(metadata["path"], len(clip_columns))
+                    if column == len(clip_paths):
+                        clip_paths.append(metadata["path"])
+                    key = (segment, column)
+                    best_distances[key] = min(distance, best_distances.get(key, distance))
+                query_index += 1
+
+        num_segments = len(descriptions)
+        if not clip_paths:
+            raise ValueError(f"No candidate clips found for {num_segments} segments")
+        unmatched_cost = max(best_distances.values(), default=0.0) + 1.0
+        cost = np.full((num_segments, len(clip_paths)), unmatched_cost)
+        for (segment, column), distance in best_distances.items():
+            cost[segment, column] = distance
+
+        # A library smaller than the video can't avoid repeats, let clips be reused in that case
+        repeats = -(-num_segments // max(len(clip_paths), 1))
+        if repeats > 1:
+            logger.warning(f"Only {len(clip_paths)} candidate clips for {num_segments} segments, clips will repeat")
+            cost = np.tile(cost, (1, repeats))
+            clip_paths = clip_paths * repeats
+
+        assignment = linear_sum_assignment(cost)
+        return [clip_paths[column] for column in assignment]
 
     @staticmethod
     def _extract_content(response):